@@ -1,4 +1,6 @@
 class Node:  # Node has only PARENT_NODE, STATE, DEPTH
+    __slots__ = ('STATE', 'PARENT_NODE', 'DEPTH')  # no per-node __dict__
+
     def __init__(self, state, parent=None, depth=0):
         self.STATE = state
         self.PARENT_NODE = parent
@@ -20,35 +22,65 @@ class Node:  # Node has only PARENT_NODE, STATE, DEPTH
 
 
 '''
-Search the tree for the goal state and return path from initial state to goal state
+A search problem given implicitly by its initial state, a goal test and a generator of
+successor states, so states are only created when their parent is expanded
+'''
+class Problem:
+    def __init__(self, initial_state, goal_test, successors):
+        self.initial_state = initial_state
+        self.goal_test = goal_test
+        self.successors = successors
+
+
+'''
+Counters of the last TREE_SEARCH call
+'''
+SEARCH_STATS = {'expanded': 0, 'duplicates': 0}
+
+
+'''
+Search the tree for the goal state and return path from initial state to goal state.
+With graph_search, states already expanded or waiting in the fringe are not added again
+(breadth-first, so the first path found to a state is never longer than a later one).
 '''
-def TREE_SEARCH():
+def TREE_SEARCH(graph_search=False, problem=None):
+    problem = problem or PROBLEM
+    SEARCH_STATS.update(expanded=0, duplicates=0)
     fringe = []
-    initial_node = Node(INITIAL_STATE)
+    initial_node = Node(problem.initial_state)
     fringe = INSERT(initial_node, fringe)
-    while fringe is not None:
+    seen = {problem.initial_state}  # hashed closed set plus the states in the fringe
+    while fringe:
         node = REMOVE_FIRST(fringe)
-        if node.STATE == GOAL_STATE:
+        if problem.goal_test(node.STATE):
             return node.path()
-        children = EXPAND(node)
+        SEARCH_STATS['expanded'] += 1
+        children = EXPAND(node, problem)
+        if graph_search:
+            children = unseen(children, seen)
         fringe = INSERT_ALL(children, fringe)
         print("fringe: {}".format(fringe))
+    return []
 
 
 '''
-Expands node and gets the successors (children) of that node.
-Return list of the successor nodes.
+Skips children whose state was already seen, counting them as duplicates
 '''
-def EXPAND(node):
-    successors = []
-    children = successor_fn(node.STATE)
+def unseen(children, seen):
     for child in children:
-        s = Node(node)  # create node for each in state list
-        s.STATE = child  # e.g. result = 'F' then 'G' from list ['F', 'G']
-        s.PARENT_NODE = node
-        s.DEPTH = node.DEPTH + 1
-        successors = INSERT(s, successors)
-    return successors
+        if child.STATE in seen:
+            SEARCH_STATS['duplicates'] += 1
+        else:
+            seen.add(child.STATE)
+            yield child
+
+
+'''
+Expands node and generates the successors (children) of that node one at a time.
+'''
+def EXPAND(node, problem):
+    for child in problem.successors(node.STATE):  # e.g. 'F' then 'G' from ['F', 'G']
+        yield Node(child, node, node.DEPTH + 1)
 
 
 '''
@@ -80,12 +112,38 @@ def REMOVE_FIRST(queue:list):
 Successor function, mapping the nodes to its successors
 '''
 def successor_fn(state):  # Lookup list of successor states
-    if state in [('W', 'W', 'E', 'E'), ('E', 'E', 'W', 'W'), ('W', 'E', 'E', 'W'), ('E', 'W', 'W', 'E')]:
+    if state in UNSAFE_STATES:
         return []
     
     return STATE_SPACE[state]  # successor_fn( 'C' ) returns ['F', 'G']
 
 
+'''
+Farmer, wolf, goat, cabbage without a state table: the goat may not be left with the wolf
+or the cabbage unless the farmer is there
+'''
+def is_safe(state):
+    farmer, wolf, goat, cabbage = state
+    return farmer == goat or (wolf != goat and cabbage != goat)
+
+
+'''
+The farmer crosses alone or with one item from his bank. Unsafe states end the game, so
+they have no successors.
+'''
+def crossings(state):
+    if not is_safe(state):
+        return
+    farmer = state[0]
+    other_bank = 'E' if farmer == 'W' else 'W'
+    for i in range(len(state)):
+        if i == 0 or state[i] == farmer:
+            next_state = list(state)
+            next_state[0] = other_bank
+            next_state[i] = other_bank
+            yield tuple(next_state)
+
+
 
 INITIAL_STATE = 'A'
 INITIAL_STATE = ('A', 'Dirty', 'Dirty')
@@ -131,14 +189,21 @@ STATE_SPACE = {('W', 'W', 'W', 'W'): [('E', 'E', 'W', 'W'), ('E', 'W', 'E', 'W')
                }
 
 
+UNSAFE_STATES = frozenset({('W', 'W', 'E', 'E'), ('E', 'E', 'W', 'W'), ('W', 'E', 'E', 'W'), ('E', 'W', 'W', 'E')})
+
+PROBLEM = Problem(INITIAL_STATE, lambda state: state == GOAL_STATE, successor_fn)
+FARMER_PROBLEM = Problem(INITIAL_STATE, lambda state: state == GOAL_STATE, crossings)
+
+
 '''
 Run tree search and display the nodes in the path to goal node
 '''
-def run():
-    path = TREE_SEARCH()
+def run(graph_search=True, problem=FARMER_PROBLEM):
+    path = TREE_SEARCH(graph_search, problem)
     print('Solution path:')
     for node in path:
         node.display()
+    print('Search stats:', SEARCH_STATS)
 
 
 if __name__ == '__main__':
@@ -1,6 +1,13 @@
+import heapq
+import math
 import sys
+from array import array
+from collections import deque
+from itertools import count
 
 class Node:
+    __slots__ = ('STATE', 'PARENT_NODE', 'DEPTH', 'WEIGHT', 'HEURISTIC', 'fn')
+
     def __init__(self, state, heuristic=6, weight=0, parent=None, depth=0):
         self.STATE = state
         self.PARENT_NODE = parent
@@ -21,47 +28,289 @@ class Node:
         print(self)
 
     def __repr__(self):
-        return f"State: {self.STATE} - f(n): {self.fn} - Depth: {self.DEPTH}"
-
-
-def TREE_SEARCH(algo: str, alpha: int):
-    fringe = []
-    initial_node = Node(INITIAL_STATE, heuristic=HEURISTICS[INITIAL_STATE] * alpha)
+        return f"State: {self.STATE} - f(n): {self.fn:g} - Depth: {self.DEPTH}"
+
+
+class NodeStore:
+    # Every generated node is one row of parallel typed arrays (state id, parent row, depth,
+    # g, h), about 28 bytes per node; states are interned to integer ids. Search code passes
+    # row indices around and only builds Node objects for display and for the final path.
+    def __init__(self):
+        self.states = []
+        self.state_ids = {}
+        self.state = array('i')
+        self.parent = array('i')
+        self.depth = array('i')
+        self.g = array('d')
+        self.h = array('d')
+
+    def intern(self, state):
+        state_id = self.state_ids.get(state)
+        if state_id is None:
+            state_id = self.state_ids[state] = len(self.states)
+            self.states.append(state)
+        return state_id
+
+    def add(self, state, g, h, parent=-1):
+        self.state.append(self.intern(state))
+        self.parent.append(parent)
+        self.depth.append(self.depth[parent] + 1 if parent >= 0 else 0)
+        self.g.append(g)
+        self.h.append(h)
+        return len(self.g) - 1
+
+    def state_of(self, index):
+        return self.states[self.state[index]]
+
+    def node(self, index, parent=None):
+        return Node(self.state_of(index), heuristic=self.h[index], weight=self.g[index],
+                    parent=parent, depth=self.depth[index])
+
+    def path(self, index):
+        indices = []
+        while index >= 0:
+            indices.append(index)
+            index = self.parent[index]
+        path = []
+        for index in reversed(indices):
+            path.append(self.node(index, path[-1] if path else None))
+        return path
+
+    def __len__(self):
+        return len(self.g)
+
+
+class Problem:
+    # A search problem given implicitly: successors(state) yields the neighbouring states,
+    # cost(state, next_state) is the step cost (1 if omitted) and heuristic(state) the
+    # estimate of the remaining cost (0 if omitted). States are only generated when their
+    # parent is expanded, so nothing has to list the whole state space.
+    def __init__(self, initial_state, goal_test, successors, cost=None, heuristic=None):
+        self.initial_state = initial_state
+        self.goal_test = goal_test
+        self.successors = successors
+        self.cost = cost or (lambda state, next_state: 1)
+        self.heuristic = heuristic or (lambda state: 0)
+
+
+# Counters of the last TREE_SEARCH call
+SEARCH_STATS = {'expanded': 0, 'generated': 0, 'duplicates': 0, 'reopened': 0, 'pruned': 0}
+
+
+# graph_search keeps a closed set (state -> g when expanded). A repeated state is skipped
+# unless it is reached more cheaply, which with an inconsistent heuristic (e.g. alpha > 1)
+# reopens it; breadth-first search never reopens. 'ida*' and 'sma*' (at most node_budget
+# nodes in memory) only avoid cycles along the current path.
+def TREE_SEARCH(algo: str, alpha: int, verbose=True, graph_search=False, problem=None, node_budget=1000):
+    problem = problem or PROBLEM
+    SEARCH_STATS.update(expanded=0, generated=0, duplicates=0, reopened=0, pruned=0)
+    if algo == 'ida*':
+        return ida_star(problem, alpha, verbose)
+    if algo == 'sma*':
+        return sma_star(problem, alpha, node_budget, verbose)
+    store = NodeStore()
+    if algo == 'bfs':
+        fringe = FifoFrontier(store)
+    elif algo in PRIORITIES:
+        fringe = PriorityFrontier(PRIORITIES[algo], store)
+    else:
+        print(f"Unknown algorithm: {algo}")
+        return []
+    reopen = algo != 'bfs'
+    closed = {}
+    skip = None
+    if graph_search:
+        skip = lambda state, g: is_duplicate(closed, store.state_ids.get(state), g, reopen)
+    initial_node = store.add(problem.initial_state, 0, problem.heuristic(problem.initial_state) * alpha)
     fringe = INSERT(initial_node, fringe)
+    path = []
     while fringe:
-        if algo == 'bfs':
-            node = REMOVE_FIRST(fringe)
-        elif algo == 'a*':
-            node = REMOVE_OPTIMAL(fringe)
-        elif algo == 'gbf':
-            node = REMOVE_CHEAP(fringe)
-        else:
-            print(f"Unknown algorithm: {algo}")
+        node = REMOVE(fringe)
+
+        if problem.goal_test(store.state_of(node)):
+            path = store.path(node)
+            break
+
+        if graph_search:
+            state_id = store.state[node]
+            if is_duplicate(closed, state_id, store.g[node], reopen):
+                SEARCH_STATS['duplicates'] += 1
+                continue
+            if state_id in closed:
+                SEARCH_STATS['reopened'] += 1
+            closed[state_id] = store.g[node]
+
+        SEARCH_STATS['expanded'] += 1
+        children = EXPAND(store, node, alpha, problem, skip)
+        fringe = INSERT_ALL(children, fringe)
+        if verbose:
+            print("Fringe:", fringe)
+    SEARCH_STATS['generated'] = len(store)
+    SEARCH_STATS['duplicates'] += fringe.duplicates
+    return path
+
+
+def is_duplicate(closed, state_id, g, reopen):
+    closed_g = closed.get(state_id)
+    return closed_g is not None and (not reopen or g >= closed_g)
+
+
+# Generates the children one at a time and returns their rows in store; children for
+# which skip(state, g) holds are counted as duplicates and never stored
+def EXPAND(store, node, alpha, problem, skip=None):
+    state = store.state_of(node)
+    for child_state in problem.successors(state):
+        g = store.g[node] + problem.cost(state, child_state)
+        if skip is not None and skip(child_state, g):
+            SEARCH_STATS['duplicates'] += 1
+            continue
+        yield store.add(child_state, g, problem.heuristic(child_state) * alpha, node)
+
+
+# Iterative-deepening A*: depth-first search that cuts off paths with f above a bound,
+# raising the bound to the smallest f that was cut off until the goal is found. Only the
+# current path and one successor generator per level are kept, so memory is O(depth).
+def ida_star(problem, alpha, verbose=True):
+    bound = problem.heuristic(problem.initial_state) * alpha
+    while True:
+        path, next_bound = bounded_search(problem, alpha, bound)
+        if path or next_bound == math.inf:
+            return path
+        bound = next_bound
+        if verbose:
+            print("IDA* bound:", bound)
+
+
+def bounded_search(problem, alpha, bound):
+    initial_state = problem.initial_state
+    path = [Node(initial_state, heuristic=problem.heuristic(initial_state) * alpha)]
+    if path[0].fn > bound:
+        return [], path[0].fn
+    on_path = {initial_state}
+    generators = [problem.successors(initial_state)]
+    smallest_cut = math.inf
+    SEARCH_STATS['generated'] += 1
+    if problem.goal_test(initial_state):
+        return path, bound
+    SEARCH_STATS['expanded'] += 1
+    while generators:
+        child_state = next(generators[-1], None)
+        if child_state is None:
+            generators.pop()
+            on_path.discard(path.pop().STATE)
+            continue
+        node = path[-1]
+        if child_state in on_path:
+            SEARCH_STATS['duplicates'] += 1
+            continue
+        child = Node(child_state, heuristic=problem.heuristic(child_state) * alpha,
+                     weight=node.WEIGHT + problem.cost(node.STATE, child_state),
+                     parent=node, depth=node.DEPTH + 1)
+        SEARCH_STATS['generated'] += 1
+        if child.fn > bound:
+            smallest_cut = min(smallest_cut, child.fn)
+            continue
+        if problem.goal_test(child_state):
+            return child.path(), bound
+        path.append(child)
+        on_path.add(child_state)
+        generators.append(problem.successors(child_state))
+        SEARCH_STATS['expanded'] += 1
+    return [], smallest_cut
+
+
+# Simplified memory-bounded A*: A* that keeps at most node_budget nodes. When memory is full
+# the shallowest leaf with the highest f is forgotten and its f is backed up into its
+# parent, which goes back on the fringe with the best forgotten f; expanding it again only
+# regenerates the forgotten children, with their backed-up f, so a subtree is rebuilt only
+# when it becomes the best option again. A node at depth node_budget - 1 cannot be extended
+# in memory (f = inf).
+def sma_star(problem, alpha, node_budget, verbose=True):
+    counter = count()
+    f = {}
+    children = {}          # node -> states of its children in memory
+    forgotten = {}         # node -> {state of a forgotten child: its backed-up f}
+    best, worst = [], []   # heaps over the fringe, stale entries skipped
+    entry = {}
+
+    def push(node):
+        entry[node] = next(counter)
+        heapq.heappush(best, (f[node], -node.DEPTH, entry[node], node))
+        heapq.heappush(worst, (-f[node], node.DEPTH, entry[node], node))
+
+    def is_current(item):
+        return entry.get(item[3]) == item[2]
+
+    def forget(leaf):
+        SEARCH_STATS['pruned'] += 1
+        parent = leaf.PARENT_NODE
+        forgotten.setdefault(parent, {})[leaf.STATE] = f[leaf]
+        children[parent].discard(leaf.STATE)
+        entry.pop(leaf, None)
+        forgotten.pop(leaf, None)  # f[leaf] already backs up what its children learned
+        del f[leaf]
+        del children[leaf]
+        f[parent] = min(forgotten[parent].values())
+        push(parent)
+
+    root = Node(problem.initial_state, heuristic=problem.heuristic(problem.initial_state) * alpha)
+    f[root] = root.fn
+    children[root] = set()
+    push(root)
+    SEARCH_STATS['generated'] += 1
+
+    while best:
+        item = heapq.heappop(best)
+        if not is_current(item):
+            continue
+        node = item[3]
+        del entry[node]
+        if f[node] == math.inf:
             return []
-
-        if node.STATE == GOAL_STATE:
+        if problem.goal_test(node.STATE):
             return node.path()
 
-        children = EXPAND(node, alpha)
-        fringe = INSERT_ALL(children, fringe)
-        print("Fringe:", fringe)
-
-
-def EXPAND(node, alpha):
-    successors = []
-    children = successor_fn(node.STATE)
-    for child_state, weight in children:
-        heuristic = HEURISTICS[child_state] * alpha
-        total_weight = weight + node.WEIGHT
-        child_node = Node(
-            state=child_state,
-            heuristic=heuristic,
-            weight=total_weight,
-            parent=node,
-            depth=node.DEPTH + 1
-        )
-        successors = INSERT(child_node, successors)
-    return successors
+        backed_up = forgotten.pop(node, {})
+        if backed_up:
+            SEARCH_STATS['reopened'] += 1
+        SEARCH_STATS['expanded'] += 1
+        ancestors = {ancestor.STATE for ancestor in node.path()}
+        in_memory = children[node]
+        for child_state in problem.successors(node.STATE):
+            if child_state in ancestors:
+                SEARCH_STATS['duplicates'] += 1
+                continue
+            if child_state in in_memory:
+                continue
+            child = Node(child_state, heuristic=problem.heuristic(child_state) * alpha,
+                         weight=node.WEIGHT + problem.cost(node.STATE, child_state),
+                         parent=node, depth=node.DEPTH + 1)
+            SEARCH_STATS['generated'] += 1
+            # pathmax keeps f non-decreasing along a path
+            f[child] = max(child.fn, f[node], backed_up.get(child_state, -math.inf))
+            if child.DEPTH >= node_budget - 1 and not problem.goal_test(child_state):
+                f[child] = math.inf
+            children[child] = set()
+            in_memory.add(child_state)
+            push(child)
+        if not in_memory:
+            if node is root:
+                return []
+            f[node] = math.inf  # dead end: forget it, its parent learns it leads nowhere
+            forget(node)
+
+        while len(f) > node_budget and worst:
+            item = heapq.heappop(worst)
+            leaf = item[3]
+            if not is_current(item) or children[leaf]:
+                continue  # only leaves can be forgotten
+            if leaf is root:
+                push(root)
+                break
+            forget(leaf)
+        if verbose:
+            print("Fringe:", [item[3] for item in sorted(best) if is_current(item)])
+    return []
 
 
 def INSERT(node, queue):
@@ -74,40 +323,119 @@ def INSERT_ALL(nodes, queue):
     return queue
 
 
-def REMOVE_FIRST(queue):
-    return queue.pop(0)
+def REMOVE(queue):
+    return queue.pop()
+
+
+class FifoFrontier:
+    # Breadth-first: O(1) removal from the front
+    def __init__(self, store):
+        self.store = store
+        self.queue = deque()
+        self.duplicates = 0
+
+    def append(self, node):
+        self.queue.append(node)
 
+    def extend(self, nodes):
+        self.queue.extend(nodes)
 
-def REMOVE_CHEAP(queue):
-    cheapest = min(queue, key=lambda n: n.HEURISTIC)
-    queue.remove(cheapest)
-    return cheapest
+    def pop(self):
+        return self.queue.popleft()
 
+    def __len__(self):
+        return len(self.queue)
 
-def REMOVE_OPTIMAL(queue):
-    best = min(queue, key=lambda n: n.fn)
-    queue.remove(best)
-    return best
+    def __iter__(self):
+        return iter(self.queue)
+
+    def __repr__(self):
+        return repr([self.store.node(node) for node in self])
+
+
+class PriorityFrontier:
+    # Binary heap of (priority, row). Rows are numbered in creation order, so ties are broken
+    # by insertion order (as min() over the old list did). best holds, for each state, the
+    # row of the cheapest node pushed for it: a node reaching its state at the same or a
+    # higher cost is never pushed, so even in tree mode each state is queued once per
+    # improvement of its cost, and rows overtaken by a cheaper node are dropped when they
+    # reach the top (lazy deletion instead of decrease-key).
+    def __init__(self, priority, store):
+        self.priority = priority
+        self.store = store
+        self.heap = []
+        self.best = {}
+        self.duplicates = 0
+
+    def append(self, node):
+        state_id = self.store.state[node]
+        best = self.best.get(state_id)
+        if best is not None and self.store.g[node] >= self.store.g[best]:
+            self.duplicates += 1
+            return
+        self.best[state_id] = node
+        heapq.heappush(self.heap, (self.priority(self.store, node), node))
+
+    def extend(self, nodes):
+        for node in nodes:
+            self.append(node)
+
+    def is_stale(self, node):
+        return self.best[self.store.state[node]] != node
+
+    def pop(self):
+        while True:
+            node = heapq.heappop(self.heap)[1]
+            if not self.is_stale(node):
+                return node
+            self.duplicates += 1
+
+    def __bool__(self):
+        while self.heap and self.is_stale(self.heap[0][1]):
+            heapq.heappop(self.heap)
+            self.duplicates += 1
+        return bool(self.heap)
+
+    def __iter__(self):
+        return (node for _, node in sorted(self.heap) if not self.is_stale(node))
+
+    def __repr__(self):
+        return repr([self.store.node(node) for node in self])
+
+
+PRIORITIES = {
+    'a*': lambda store, node: store.g[node] + store.h[node],   # f(n) = g(n) + alpha * h(n)
+    'gbf': lambda store, node: store.h[node],                  # h(n)
+    'ucs': lambda store, node: store.g[node],                  # g(n)
+}
 
 
 def successor_fn(state):
-    return STATE_SPACE[state]
+    for child_state, _ in STATE_SPACE[state]:
+        yield child_state
+
+
+def step_cost(state, next_state):
+    return dict(STATE_SPACE[state])[next_state]
 
 
-def run(config: str, alpha: int):
-    print(f"\nRunning tree search with algorithm = {config}, alpha = {alpha}")
-    path = TREE_SEARCH(config, alpha)
+def run(config: str, alpha: int, verbose=True, graph_search=False, problem=None, node_budget=1000):
+    print(f"\nRunning {'graph' if graph_search else 'tree'} search with algorithm = {config}, alpha = {alpha}")
+    path = TREE_SEARCH(config, alpha, verbose, graph_search, problem, node_budget)
     print('\nSolution path:')
     for node in path:
         node.display()
+    print("Search stats:", SEARCH_STATS)
 
 
 def print_help():
     print("=== SEARCH AGENT ===")
     print("Choose search algorithm and heuristic weight.")
     print("\nOptions:")
-    print("  algorithm : 'bfs', 'a*', or 'gbf'")
+    print("  algorithm : 'bfs', 'a*', 'gbf', 'ucs', 'ida*', or 'sma*'")
     print("  alpha     : integer weight for heuristic (default is 1)")
+    print("  graph     : 'y' to skip states that were already expanded")
+    print("  budget    : most nodes kept in memory by sma* (default is 1000)")
     print("\nExamples:")
     print("  Algorithm: a*")
     print("  Alpha: 1\n")
@@ -135,14 +463,15 @@ HEURISTICS = {
     'F': 5, 'G': 4, 'H': 1, 'I': 2, 'J': 1,
     'K': 0, 'L': 0
 }
+PROBLEM = Problem(INITIAL_STATE, lambda state: state == GOAL_STATE, successor_fn, step_cost, HEURISTICS.get)
 
 # --------------- ENTRY POINT ----------------
 if __name__ == '__main__':
     print_help()
 
     # Ask user input if not provided via arguments
-    config = input("Enter algorithm (bfs / a* / gbf): ").strip().lower()
-    if config not in ['bfs', 'a*', 'gbf']:
+    config = input("Enter algorithm (bfs / a* / gbf / ucs / ida* / sma*): ").strip().lower()
+    if config not in ['bfs', 'a*', 'gbf', 'ucs', 'ida*', 'sma*']:
         print("Invalid algorithm. Exiting.")
         sys.exit(1)
 
@@ -153,4 +482,16 @@ if __name__ == '__main__':
         print("Invalid alpha. Must be an integer.")
         sys.exit(1)
 
-    run(config, alpha)
+    graph_search = False
+    node_budget = 1000
+    if config == 'sma*':
+        budget_input = input("Enter node budget (integer): ").strip()
+        try:
+            node_budget = int(budget_input or 1000)
+        except ValueError:
+            print("Invalid node budget. Must be an integer.")
+            sys.exit(1)
+    elif config != 'ida*':
+        graph_search = input("Graph search, skipping repeated states? (y/n): ").strip().lower() == 'y'
+
+    run(config, alpha, graph_search=graph_search, node_budget=node_budget)
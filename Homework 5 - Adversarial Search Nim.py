@@ -1,6 +1,221 @@
-import copy
+import mmap
+import multiprocessing
+import os
+import struct
+import time
+from array import array
+from bisect import insort
+from collections import OrderedDict
 
-minimax_cache = {}
+import numpy as np
+
+
+class TranspositionTable:
+    # Bounded cache of solved positions. 'lru' evicts the least recently used entry;
+    # 'depth' is a two-tier slot table: each bucket has a depth-preferred entry, which a
+    # colliding entry only replaces if it covers a subtree at least as big, and an
+    # always-replace entry that takes whatever the first tier turns away or pushes out.
+    def __init__(self, capacity=1 << 20, policy='lru'):
+        self.capacity = capacity
+        self.policy = policy
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.entries = OrderedDict()
+        self.buckets = max(capacity // 2, 1)
+        self.slots = [None] * self.buckets if policy == 'depth' else None
+        self.recent = [None] * self.buckets if policy == 'depth' else None
+
+    def lookup(self, key):
+        index = hash(key) % self.buckets
+        for slot in (self.slots[index], self.recent[index]):
+            if slot is not None and slot[0] == key:
+                return slot[1:3]
+        return None
+
+    def get(self, key):
+        if self.policy == 'depth':
+            entry = self.lookup(key)
+        else:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def peek(self, key):
+        # Lookup for move ordering: no statistics, no change to the LRU order
+        if self.policy == 'depth':
+            return self.lookup(key)
+        return self.entries.get(key)
+
+    def put(self, key, value, move, depth):
+        if self.policy == 'depth':
+            index = hash(key) % self.buckets
+            entry = (key, value, move, depth)
+            deep, recent = self.slots[index], self.recent[index]
+            if recent is not None and recent[0] == key:
+                recent = self.recent[index] = None
+            if deep is None or deep[0] == key or deep[3] <= depth:
+                self.slots[index] = entry
+                if deep is None or deep[0] == key:
+                    return
+                entry = deep  # the replaced entry drops to the always-replace tier
+            if recent is not None:
+                self.evictions += 1
+            self.recent[index] = entry
+            return
+        self.entries[key] = (value, move)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def items(self):
+        if self.policy == 'depth':
+            return [(slot[0], slot[1:3]) for slot in self.slots + self.recent if slot is not None]
+        return list(self.entries.items())
+
+    def __len__(self):
+        if self.policy == 'depth':
+            return sum(1 for slot in self.slots + self.recent if slot is not None)
+        return len(self.entries)
+
+    def stats(self):
+        return {'entries': len(self), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+minimax_cache = TranspositionTable()
+
+
+# Solved positions on disk, shared read-only (mmap) by every process that opens the file.
+# Layout: header (magic, version, count, key bytes), count + 1 key offsets, the sorted
+# keys back to back, one int8 value per key and one (pile, a, b) uint32 move per key
+# ((0, 0, 0) = no move), all in native byte order. A file with another magic or version
+# (including one written with the other byte order) is stale and ignored.
+CACHE_FILE = 'nim_solved.bin'
+CACHE_MAGIC = b'NIMS'
+CACHE_VERSION = 1
+HEADER = struct.Struct('=4sIQQ')
+
+
+class SolvedPositions:
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self.buffer = None
+        self.count = 0
+        self.unavailable = False
+
+    def open(self):
+        # Lazy: the file is only mapped on the first lookup. A missing or stale file is
+        # only looked at again after close(), which save_solved_positions calls.
+        if self.buffer is not None or self.unavailable:
+            return
+        if not os.path.exists(self.path):
+            self.unavailable = True
+            return
+        with open(self.path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                self.unavailable = True
+                return
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, key_bytes = HEADER.unpack_from(buffer)
+        if magic != CACHE_MAGIC or version != CACHE_VERSION:
+            print(f"Ignoring stale cache {self.path} (version {version}, expected {CACHE_VERSION})")
+            self.unavailable = True
+            buffer.close()
+            return
+        self.buffer = buffer
+        self.count = count
+        self.offsets_start = HEADER.size
+        self.keys_start = self.offsets_start + 8 * (count + 1)
+        self.values_start = self.keys_start + key_bytes
+        self.moves_start = self.values_start + count
+
+    def key(self, i):
+        start, end = struct.unpack_from('=2Q', self.buffer, self.offsets_start + 8 * i)
+        return self.buffer[self.keys_start + start:self.keys_start + end]
+
+    def get(self, key):
+        self.open()
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self.count or self.key(lo) != key:
+            return None
+        return self.entry(lo)
+
+    def entry(self, i):
+        value = struct.unpack_from('=b', self.buffer, self.values_start + i)[0]
+        move = struct.unpack_from('=3I', self.buffer, self.moves_start + 12 * i)
+        return value, (move if move[0] else None)
+
+    def items(self):
+        self.open()
+        for i in range(self.count):
+            yield self.key(i), self.entry(i)
+
+    def __len__(self):
+        self.open()
+        return self.count
+
+    def close(self):
+        if self.buffer is not None:
+            self.buffer.close()
+        self.buffer = None
+        self.count = 0
+        self.unavailable = False
+
+
+solved_positions = SolvedPositions()
+
+
+# Merge the transposition table into the file at path; written to a temporary file
+# first so processes that have the old file mapped keep a consistent view
+def save_solved_positions(path=CACHE_FILE, table=None):
+    table = minimax_cache if table is None else table
+    entries = {}
+    existing = solved_positions if solved_positions.path == path else SolvedPositions(path)
+    entries.update(existing.items())
+    entries.update(table.items())
+    keys = sorted(entries)
+
+    offsets = array('Q', [0])
+    for key in keys:
+        offsets.append(offsets[-1] + len(key))
+    values = array('b', [entries[key][0] for key in keys])
+    moves = array('I')
+    for key in keys:
+        moves.extend(entries[key][1] or (0, 0, 0))
+
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(HEADER.pack(CACHE_MAGIC, CACHE_VERSION, len(keys), offsets[-1]))
+        f.write(offsets.tobytes())
+        f.write(b''.join(keys))
+        f.write(values.tobytes())
+        f.write(moves.tobytes())
+    os.replace(temporary, path)
+    if existing is solved_positions:
+        solved_positions.close()
+    return len(keys)
+
+
+# Piles of 1 or 2 can never be split again, so a position is identified by the
+# sorted multiset of its piles of 3 or more, packed into bytes
+def canonical(state):
+    return tuple(sorted(pile for pile in state if pile > 2))
+
+
+def canonical_key(piles):
+    return array('I', piles).tobytes()
 
 
 # Check if a pile can be split into two unequal, non-empty piles
@@ -38,46 +253,326 @@ def utility(state, is_max_turn):
         return -1 if is_max_turn else 1  # the player who cannot move loses
     return 0
 
-# Minimax algorithm
+class SearchTimeout(Exception):
+    pass
+
+
+# Minimax algorithm: value is from MAX's point of view, next state is the chosen successor
 def minimax(state, is_max_turn):
-    key = (tuple(state), is_max_turn)
-    if key in minimax_cache:
-        return minimax_cache[key]
+    if is_terminal(state):
+        return utility(state, is_max_turn), None
+    value, move = alphabeta(canonical(state))
+    return (value if is_max_turn else -value), apply_move(state, move)
+
+
+def child_positions(piles):
+    # (move, canonical child) for every distinct split of piles
+    previous = None
+    for i, pile in enumerate(piles):
+        if pile == previous:
+            continue  # equal piles give the same successors
+        previous = pile
+        rest = piles[:i] + piles[i + 1:]
+        for a, b in valid_splits(pile):
+            child = list(rest)
+            if a > 2:
+                insort(child, a)
+            if b > 2:
+                insort(child, b)
+            yield (pile, a, b), tuple(child)
+
 
+def ordered_children(piles):
+    # Children the table already knows are lost for the opponent come first, known
+    # wins for the opponent last, so a winning move usually cuts off the search at once
+    known_losses, unknown, known_wins = [], [], []
+    for move, child in child_positions(piles):
+        entry = minimax_cache.peek(canonical_key(child))
+        if entry is None:
+            unknown.append((move, child))
+        elif entry[0] < 0:
+            known_losses.append((move, child))
+        else:
+            known_wins.append((move, child))
+    return known_losses + unknown + known_wins
+
+
+# Negamax alpha-beta on canonical piles. Value is +1 if the player to move wins, -1 if it
+# loses and 0 if depth ran out first; only proven (+1/-1) results go into the table.
+# Because +1 is the best possible value, finding one winning split ends the search.
+def alphabeta(piles, depth=None, alpha=-1, beta=1, deadline=None):
+    key = canonical_key(piles)
+    entry = minimax_cache.get(key)
+    if entry is None:
+        entry = solved_positions.get(key)
+        if entry is not None:
+            minimax_cache.put(key, entry[0], entry[1], sum(piles))
+    if entry is not None:
+        return entry
+    if not piles:
+        minimax_cache.put(key, -1, None, 0)
+        return -1, None
+    if depth == 0:
+        return 0, None
+    if deadline is not None and time.perf_counter() > deadline:
+        raise SearchTimeout
+
+    best_value, best_move = -2, None
+    for move, child in ordered_children(piles):
+        value, _ = alphabeta(child, None if depth is None else depth - 1, -beta, -alpha, deadline)
+        value = -value
+        if value > best_value:
+            best_value, best_move = value, move
+        alpha = max(alpha, value)
+        if alpha >= beta:
+            break
+
+    if best_value != 0:
+        minimax_cache.put(key, best_value, best_move, sum(piles))
+    return best_value, best_move
+
+
+def iterative_deepening(state, is_max_turn, time_budget):
+    # Deepens until the position is proven or time_budget seconds pass; returns the best
+    # move of the deepest finished iteration (value 0 = not proven within the budget)
+    if is_terminal(state):
+        return utility(state, is_max_turn), None
+    piles = canonical(state)
+    deadline = time.perf_counter() + time_budget
+    value, move = 0, next(child_positions(piles))[0]
+    depth = 1
+    try:
+        while True:
+            value, best = alphabeta(piles, depth, deadline=deadline)
+            move = best or move
+            if value != 0 or depth > sum(piles):
+                break
+            depth += 1
+    except SearchTimeout:
+        pass
+    return (value if is_max_turn else -value), apply_move(state, move)
+
+
+# Parallel minimax: the first split_depth plies below the root are expanded here and the
+# distinct positions at the bottom are solved by a process pool. Each worker searches with
+# its own transposition table and sends back the entries it added, which are merged into
+# minimax_cache. As results come in the split tree is re-evaluated, and the pool is
+# stopped as soon as the root is proven (at the root: once any child is a loss for the
+# opponent).
+def parallel_minimax(state, is_max_turn, processes=None, split_depth=1):
     if is_terminal(state):
-        result = (utility(state, is_max_turn), None)
-        minimax_cache[key] = result
-        return result
-
-    best_value = float('-inf') if is_max_turn else float('inf')
-    best_move = None
-
-    for succ in successors(state):
-        val, _ = minimax(list(succ), not is_max_turn)
-        if is_max_turn:
-            if val > best_value:
-                best_value = val
-                best_move = succ
+        return utility(state, is_max_turn), None
+    root = canonical(state)
+    children = split_tree(root, split_depth)
+    values = {}
+    pending = []
+    for leaf in {child for moves in children.values() for _, child in moves if child not in children}:
+        key = canonical_key(leaf)
+        entry = minimax_cache.get(key) or solved_positions.get(key)
+        if entry is not None:
+            values[leaf] = entry[0]
+        elif not leaf:
+            values[leaf] = -1
         else:
-            if val < best_value:
-                best_value = val
-                best_move = succ
+            pending.append(leaf)
+
+    if tree_value(root, children, values) == 0:
+        pending.sort(key=sum)  # small subtrees first, they settle parts of the tree quickly
+        context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+        pool = context.Pool(processes, initializer=_init_worker)
+        try:
+            for leaf, value, _, entries in pool.imap_unordered(_solve_position, pending):
+                values[leaf] = value
+                for key, (entry_value, move) in entries:
+                    minimax_cache.put(key, entry_value, move, sum(array('I', key)))
+                if tree_value(root, children, values) != 0:
+                    break
+        finally:
+            pool.terminate()
+            pool.join()
+
+    for node in children:
+        if values.get(node):
+            minimax_cache.put(canonical_key(node), values[node], tree_move(node, children, values), sum(node))
+    value = values[root]
+    move = tree_move(root, children, values)
+    return (value if is_max_turn else -value), apply_move(state, move)
+
+
+# Positions within plies moves of piles, mapped to their (move, child) lists
+def split_tree(piles, plies):
+    children = {}
+    frontier = [piles]
+    for _ in range(plies):
+        next_frontier = []
+        for node in frontier:
+            if node and node not in children:
+                children[node] = list(child_positions(node))
+                next_frontier.extend(child for _, child in children[node])
+        frontier = next_frontier
+    return children
+
+
+# Negamax over the split tree with the leaf values known so far (0 = not proven yet)
+def tree_value(node, children, values):
+    if node in values or node not in children:
+        return values.get(node, 0)
+    value = -1
+    for _, child in children[node]:
+        child_value = tree_value(child, children, values)
+        if child_value == -1:
+            value = 1
+            break
+        if child_value == 0:
+            value = 0
+    if value:
+        values[node] = value
+    return value
+
+
+def tree_move(node, children, values):
+    for move, child in children[node]:
+        if values.get(child) == -1:
+            return move
+    return children[node][0][0]
+
+
+_worker = {}
 
-    result = (best_value, list(best_move))
-    minimax_cache[key] = result
-    return result
 
+def _init_worker():
+    global minimax_cache
+    minimax_cache = TranspositionTable()
+    _worker['sent'] = set()
 
-# Play game between MIN and MAX using minimax
-def play_nim(starting_pile):
+
+def _solve_position(piles):
+    value, move = alphabeta(piles)
+    entries = [(key, entry) for key, entry in minimax_cache.items() if key not in _worker['sent']]
+    _worker['sent'].update(key for key, _ in entries)
+    return piles, value, move, entries
+
+
+# Sprague-Grundy solver. The game is a sum of independent one-pile games, so a position
+# is lost for the player to move exactly when the XOR of its piles' Grundy numbers is 0.
+# g[n] = mex{g[a] ^ g[n - a] : 1 <= a < n / 2}; each mex is one vectorized pass over the
+# n / 2 splits, O(n^2) in total, and with a file the table is saved so that is paid only once.
+GRUNDY_FILE = 'grundy_numbers.npy'
+grundy_numbers = np.zeros(0, dtype=np.uint8)
+
+
+def compute_grundy(size, known=()):
+    g = np.zeros(size + 1, dtype=np.uint8)
+    g[:len(known)] = known[:size + 1]
+    for n in range(max(len(known), 3), size + 1):
+        half = (n - 1) // 2
+        options = g[1:half + 1] ^ g[n - half:n][::-1]
+        seen = np.bincount(options, minlength=257)
+        mex = int(np.flatnonzero(seen == 0)[0])
+        if mex > 255:
+            raise OverflowError(f"Grundy number of {n} does not fit in uint8")
+        g[n] = mex
+    return g
+
+
+# Grundy numbers for piles 0..size, kept in memory. With path set (e.g. GRUNDY_FILE) they
+# are memory-mapped from that file, which is extended (then saved again) only when it is
+# missing or too short; the new table goes to a temporary file first, like
+# save_solved_positions, so processes that have the old file mapped keep a consistent view
+def grundy_table(size, path=None):
+    global grundy_numbers
+    if path is None:
+        if len(grundy_numbers) <= size:
+            grundy_numbers = compute_grundy(size, np.asarray(grundy_numbers))
+        return grundy_numbers
+    if os.path.exists(path):
+        table = np.load(path, mmap_mode='r')
+        if len(table) > size:
+            grundy_numbers = table
+            return grundy_numbers
+        if len(table) > len(grundy_numbers):
+            grundy_numbers = table
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        np.save(f, compute_grundy(max(size, len(grundy_numbers) - 1), np.asarray(grundy_numbers)))
+    os.replace(temporary, path)
+    grundy_numbers = np.load(path, mmap_mode='r')
+    return grundy_numbers
+
+
+def grundy_value(state):
+    g = grundy_table(max(state, default=0))
+    total = 0
+    for pile in state:
+        total ^= int(g[pile])
+    return total
+
+
+# Split of pile whose two halves XOR to target, or None
+def find_split(pile, target):
+    g = grundy_table(pile)
+    half = (pile - 1) // 2
+    options = g[1:half + 1] ^ g[pile - half:pile][::-1]
+    hits = np.flatnonzero(options == target)
+    if len(hits) == 0:
+        return None
+    a = int(hits[0]) + 1
+    return pile, a, pile - a
+
+
+# Same interface as minimax: a winning split when the XOR is non-zero, otherwise the
+# first legal split
+def grundy_move(state, is_max_turn):
+    if is_terminal(state):
+        return utility(state, is_max_turn), None
+    total = grundy_value(state)
+    g = grundy_numbers
+    if total:
+        # every value below g[pile] is reachable from pile, so try those piles first
+        piles = sorted(set(state), key=lambda pile: (int(g[pile]) ^ total) >= int(g[pile]))
+        for pile in piles:
+            move = find_split(pile, int(g[pile]) ^ total) if pile > 2 else None
+            if move is not None:
+                value = 1 if is_max_turn else -1
+                return value, apply_move(state, move)
+    pile = max(state)
+    value = -1 if is_max_turn else 1
+    return value, apply_move(state, (pile, 1, pile - 1))
+
+
+def apply_move(state, move):
+    pile, a, b = move
+    next_state = list(state)
+    next_state.remove(pile)
+    next_state += [a, b]
+    next_state.sort()
+    return next_state
+
+
+# Play game between MIN and MAX using minimax (or iterative deepening with a time budget
+# in seconds per move); solver='grundy' uses the Sprague-Grundy table instead, read from
+# and saved to grundy_file if set (e.g. GRUNDY_FILE). With cache_file set (e.g.
+# CACHE_FILE), positions solved by minimax are saved there for the next run; with
+# processes set, each move is searched by parallel_minimax.
+def play_nim(starting_pile, time_budget=None, solver='minimax', cache_file=None, processes=None,
+             grundy_file=None):
     state = [starting_pile]
     is_max_turn = False  # MIN starts
+    if solver == 'grundy':
+        grundy_table(starting_pile, grundy_file)  # no pile can grow past the starting one
 
     print("Starting Nim game with pile:", state)
     turn = 0
     while not is_terminal(state):
         print(f"\nTurn {turn}: {'MAX' if is_max_turn else 'MIN'} to play")
-        _, next_state = minimax(state, is_max_turn)
+        if solver == 'grundy':
+            _, next_state = grundy_move(state, is_max_turn)
+        elif processes is not None:
+            _, next_state = parallel_minimax(state, is_max_turn, processes)
+        elif time_budget is None:
+            _, next_state = minimax(state, is_max_turn)
+        else:
+            _, next_state = iterative_deepening(state, is_max_turn, time_budget)
         print("Current state:", state)
         print("Next move:    ", next_state)
         state = next_state
@@ -85,6 +580,10 @@ def play_nim(starting_pile):
         turn += 1
 
     print(f"\nGame over! Winner: {'MAX' if not is_max_turn else 'MIN'}")
+    if solver != 'grundy':
+        print("Transposition table:", minimax_cache.stats())
+        if cache_file is not None:
+            print("Solved positions saved:", save_solved_positions(cache_file))
 
 
 if __name__ == '__main__':
@@ -1,3 +1,8 @@
+import heapq
+import multiprocessing
+import random
+import time
+from collections import deque
 from random import shuffle
 
 
@@ -7,39 +12,504 @@ class CSP:
         self.domains = domains
         self.neighbours = neighbours
         self.constraints = constraints
+        self.variable_ordering = 'static'
+        self.value_ordering = 'static'
+        self.inference = 'none'
+        self.stats = {'nodes': 0, 'backtracks': 0}
 
-    def backtracking_search(self):
-        return self.recursive_backtracking({})
+    def backtracking_search(self, variable_ordering='static', value_ordering='static', inference='none'):
+        # variable_ordering: 'static' (list order) or 'mrv' (minimum remaining values,
+        # ties broken by most unassigned neighbours); value_ordering: 'static' or 'lcv';
+        # inference: 'none', 'forward_checking' or 'mac' (maintain arc consistency with AC-3)
+        self.variable_ordering = variable_ordering
+        self.value_ordering = value_ordering
+        self.inference = inference
+        self.stats = {'nodes': 0, 'backtracks': 0}
+        self.init_counters()
+        return self.iterative_backtracking({})
 
     def recursive_backtracking(self, assignment):
         if self.is_complete(assignment):
             return assignment
         variable = self.select_unassigned_variable(assignment)
         for value in self.order_domain_values(variable, assignment):
-            if self.is_consistent(variable, value, assignment):
-                assignment[variable] = value
-                result = self.recursive_backtracking(assignment)
-                if result != False:
-                    return result
-                    
+            if self.is_available(variable, value):
+                self.assign(variable, value, assignment)
+                mark = len(self.trail)
+                if self.infer(variable, assignment):
+                    result = self.recursive_backtracking(assignment)
+                    if result != False:
+                        return result
+                self.undo(mark)
+                self.unassign(variable, assignment)
+
+        self.stats['backtracks'] += 1
         return False
 
+    def iterative_backtracking(self, assignment, stop=None, mode='first'):
+        # Same search as recursive_backtracking with an explicit stack of
+        # [variable, ordered values, next index, trail mark] frames.
+        # mode 'first' returns a solution or False, 'count' the number of solutions and
+        # 'all' a list of them. Returns None if the stop event is set mid-search.
+        solutions = []
+        count = 0
+        if self.is_complete(assignment):
+            solutions.append(dict(assignment))
+            return solutions[0] if mode == 'first' else (1 if mode == 'count' else solutions)
+
+        variable = self.select_unassigned_variable(assignment)
+        stack = [[variable, self.order_domain_values(variable, assignment), 0, None]]
+        while stack:
+            frame = stack[-1]
+            variable, values, index, mark = frame
+            if mark is not None:
+                # Coming back to this frame: retract the value tried last time
+                self.undo(mark)
+                self.unassign(variable, assignment)
+                frame[3] = None
+            while index < len(values) and not self.is_available(variable, values[index]):
+                index += 1
+            if index == len(values):
+                stack.pop()
+                self.stats['backtracks'] += 1
+                continue
+            frame[2] = index + 1
+
+            self.assign(variable, values[index], assignment)
+            frame[3] = len(self.trail)
+            if stop is not None and self.stats['nodes'] % 1024 == 0 and stop.is_set():
+                return None
+            if not self.infer(variable, assignment):
+                continue
+            if self.is_complete(assignment):
+                if mode == 'first':
+                    return assignment
+                count += 1
+                if mode == 'all':
+                    solutions.append(dict(assignment))
+                continue
+            variable = self.select_unassigned_variable(assignment)
+            stack.append([variable, self.order_domain_values(variable, assignment), 0, None])
+
+        if mode == 'first':
+            return False
+        return count if mode == 'count' else solutions
+
+    def split(self, assignment, depth):
+        # Consistent partial assignments of the first depth variables picked by the search
+        if depth == 0 or self.is_complete(assignment):
+            yield list(assignment.items())
+            return
+        variable = self.select_unassigned_variable(assignment)
+        for value in self.order_domain_values(variable, assignment):
+            if self.is_available(variable, value):
+                self.assign(variable, value, assignment)
+                mark = len(self.trail)
+                if self.infer(variable, assignment):
+                    yield from self.split(assignment, depth - 1)
+                self.undo(mark)
+                self.unassign(variable, assignment)
+
+    def parallel_search(self, processes=None, split_depth=3, mode='first',
+                        variable_ordering='static', value_ordering='static', inference='none'):
+        # Splits the tree on the first split_depth variables and solves the subproblems in a
+        # process pool. Idle workers pull the next subproblem, so a few large subtrees do not
+        # leave the others waiting. In mode 'first' every worker stops once one finds a solution.
+        self.variable_ordering = variable_ordering
+        self.value_ordering = value_ordering
+        self.inference = inference
+        self.stats = {'nodes': 0, 'backtracks': 0}
+        self.init_counters()
+        prefixes = list(self.split({}, split_depth))
+
+        # Workers inherit the CSP (constraints are often closures, which do not pickle)
+        context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+        stop = context.Event()
+        pool = context.Pool(processes, initializer=_init_worker, initargs=(self, stop, {'mode': mode}))
+        count, solutions = 0, []
+        try:
+            for result in pool.imap_unordered(_solve_subproblem, prefixes):
+                if mode == 'first':
+                    if result:
+                        stop.set()
+                        return result
+                elif mode == 'count':
+                    count += result
+                else:
+                    solutions.extend(result)
+        finally:
+            pool.terminate()
+            pool.join()
+
+        if mode == 'first':
+            return False
+        return count if mode == 'count' else solutions
+
+    def connected_components(self):
+        # Components of the undirected constraint graph, each in self.variables order
+        adjacent = {variable: set(self.neighbours[variable]) for variable in self.variables}
+        for variable in self.variables:
+            for neighbour in self.neighbours[variable]:
+                adjacent[neighbour].add(variable)
+        component_of = {}
+        components = []
+        for start in self.variables:
+            if start in component_of:
+                continue
+            component_of[start] = len(components)
+            queue = deque([start])
+            while queue:
+                variable = queue.popleft()
+                for neighbour in adjacent[variable]:
+                    if neighbour not in component_of:
+                        component_of[neighbour] = len(components)
+                        queue.append(neighbour)
+            components.append([])
+        for variable in self.variables:
+            components[component_of[variable]].append(variable)
+        return components
+
+    def subproblem(self, variables):
+        inside = set(variables)
+        neighbours = {v: [n for n in self.neighbours[v] if n in inside] for v in variables}
+        return CSP(variables, {v: self.domains[v] for v in variables}, neighbours, self.constraints)
+
+    def is_tree(self):
+        # Assumes a connected graph: a tree has exactly one undirected edge fewer than nodes
+        edges = {frozenset((v, n)) for v in self.variables for n in self.neighbours[v] if n != v}
+        return len(edges) == len(self.variables) - 1
+
+    def compatible(self, first, first_value, second, second_value):
+        # Checks the pair from whichever side lists the other as a neighbour
+        if second in self.neighbours[first] and not self.satisfies(first, first_value, second, second_value):
+            return False
+        if first in self.neighbours[second] and not self.satisfies(second, second_value, first, first_value):
+            return False
+        return True
+
+    def solve_tree(self):
+        # Tree-structured CSP in O(n d^2): directed arc consistency from the leaves up,
+        # then a backtrack-free assignment from the root down
+        self.init_graph()
+        root = self.variables[0]
+        parent = {root: None}
+        order = [root]
+        for variable in order:
+            for neighbour in list(self.neighbours[variable]) + self.dependents[variable]:
+                if neighbour not in parent:
+                    parent[neighbour] = variable
+                    order.append(neighbour)
+
+        domains = {v: list(self.domains[v]) for v in self.variables}
+        for child in reversed(order[1:]):
+            up = parent[child]
+            domains[up] = [value for value in domains[up]
+                           if any(self.compatible(up, value, child, option) for option in domains[child])]
+            if not domains[up]:
+                return False
+
+        if not domains[root]:
+            return False
+        assignment = {root: domains[root][0]}
+        for child in order[1:]:
+            up = parent[child]
+            assignment[child] = next(value for value in domains[child]
+                                     if self.compatible(up, assignment[up], child, value))
+        return assignment
+
+    def solve_by_components(self, processes=None, **search_options):
+        # Solves each connected component on its own: trees with solve_tree, the rest with
+        # backtracking_search(**search_options); components go to a process pool if requested
+        components = self.connected_components()
+        if processes and processes > 1 and len(components) > 1:
+            context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+            with context.Pool(processes, initializer=_init_worker, initargs=(self, None, search_options)) as pool:
+                results = pool.map(_solve_component, components)
+        else:
+            results = [self.solve_component(component, search_options) for component in components]
+
+        assignment = {}
+        for result in results:
+            if result is False:
+                return False
+            assignment.update(result)
+        return assignment
+
+    def solve_component(self, component, search_options):
+        problem = self.subproblem(component)
+        if problem.is_tree():
+            return problem.solve_tree()
+        return problem.backtracking_search(**search_options)
+
+    def init_graph(self):
+        # dependents[v]: variables that list v as a neighbour, i.e. whose checks involve v
+        self.constraint_functions = list({id(c): c for c in self.constraints.values()}.values())
+        self.dependents = {variable: [] for variable in self.variables}
+        for variable in self.variables:
+            for neighbour in self.neighbours[variable]:
+                self.dependents[neighbour].append(variable)
+        self.position = {variable: i for i, variable in enumerate(self.variables)}
+
+    def init_counters(self):
+        # conflicts[v][x]: assigned neighbours of v that rule out v = x
+        # pruned[v]: values removed by arc consistency, each removal also recorded on the trail
+        # remaining[v]: values of v that are neither in conflict nor pruned
+        # degree[v]: unassigned neighbours of v
+        self.init_graph()
+        self.conflicts = {v: dict.fromkeys(self.domains[v], 0) for v in self.variables}
+        self.pruned = {v: set() for v in self.variables}
+        self.trail = []
+        self.remaining = {v: len(self.conflicts[v]) for v in self.variables}
+        self.degree = {v: len(self.neighbours[v]) for v in self.variables}
+        # Lazy heap for MRV: stale entries are skipped when they no longer match the counters
+        self.rebuild_mrv()
+
+    def satisfies(self, variable, value, neighbour, neighbour_value):
+        for constraint in self.constraint_functions:
+            if not constraint(variable, value, neighbour, neighbour_value):
+                return False
+        return True
+
+    def assign(self, variable, value, assignment):
+        assignment[variable] = value
+        self.stats['nodes'] += 1
+        self.update_counters(variable, value, assignment, 1)
+
+    def unassign(self, variable, assignment):
+        value = assignment.pop(variable)
+        self.update_counters(variable, value, assignment, -1)
+        self.push_mrv(variable)
+
+    def update_counters(self, variable, value, assignment, step):
+        for dependent in self.dependents[variable]:
+            if dependent in assignment:
+                continue
+            self.degree[dependent] -= step
+            counts = self.conflicts[dependent]
+            for option in counts:
+                if not self.satisfies(dependent, option, variable, value):
+                    counts[option] += step
+                    if counts[option] == (1 if step > 0 else 0) and option not in self.pruned[dependent]:
+                        self.remaining[dependent] -= step
+            self.push_mrv(dependent)
+
+    def is_available(self, variable, value):
+        return self.conflicts[variable][value] == 0 and value not in self.pruned[variable]
+
+    def prune(self, variable, value):
+        self.pruned[variable].add(value)
+        self.trail.append((variable, value))
+        if self.conflicts[variable][value] == 0:
+            self.remaining[variable] -= 1
+            self.push_mrv(variable)
+
+    def undo(self, mark):
+        # Restores every pruning recorded after mark, newest first
+        while len(self.trail) > mark:
+            variable, value = self.trail.pop()
+            self.pruned[variable].discard(value)
+            if self.conflicts[variable][value] == 0:
+                self.remaining[variable] += 1
+                self.push_mrv(variable)
+
+    def infer(self, variable, assignment):
+        if self.inference == 'none':
+            return True
+
+        # Forward checking: the conflict counters already hold the values ruled out by the
+        # new assignment, so a neighbour with nothing left is a dead end
+        for dependent in self.dependents[variable]:
+            if dependent not in assignment and self.remaining[dependent] == 0:
+                return False
+        if self.inference != 'mac':
+            return True
+
+        # AC-3 over arcs between unassigned variables, starting next to the assigned one
+        queue = deque()
+        for dependent in self.dependents[variable]:
+            if dependent not in assignment:
+                queue.extend((other, dependent) for other in self.dependents[dependent]
+                             if other not in assignment)
+        while queue:
+            first, second = queue.popleft()
+            if self.revise(first, second):
+                if self.remaining[first] == 0:
+                    return False
+                queue.extend((other, first) for other in self.dependents[first]
+                             if other not in assignment and other != second)
+        return True
+
+    def revise(self, variable, neighbour):
+        # Prunes values of variable that no available value of neighbour supports
+        revised = False
+        support = [option for option in self.conflicts[neighbour] if self.is_available(neighbour, option)]
+        for value in self.conflicts[variable]:
+            if not self.is_available(variable, value):
+                continue
+            if not any(self.satisfies(variable, value, neighbour, option) for option in support):
+                self.prune(variable, value)
+                revised = True
+        return revised
+
+    def mrv_entry(self, variable):
+        return self.remaining[variable], -self.degree[variable], self.position[variable], variable
+
+    def rebuild_mrv(self):
+        self.mrv_heap = [self.mrv_entry(v) for v in self.variables]
+        heapq.heapify(self.mrv_heap)
+
+    def push_mrv(self, variable):
+        if self.variable_ordering == 'mrv':
+            heapq.heappush(self.mrv_heap, self.mrv_entry(variable))
+            # Stale entries only leave from the top; once they pile up, start over from
+            # the live counters so the heap stays proportional to the number of variables
+            if len(self.mrv_heap) > 4 * len(self.variables) + 64:
+                self.rebuild_mrv()
+
     def select_unassigned_variable(self, assignment):
+        if self.variable_ordering == 'mrv':
+            heap = self.mrv_heap
+            while True:
+                remaining, degree, _, variable = heap[0]
+                if (variable not in assignment and remaining == self.remaining[variable]
+                        and -degree == self.degree[variable]):
+                    return variable
+                heapq.heappop(heap)
+
+        # Static order assigns a prefix of self.variables, so the next one is usually at len(assignment)
+        if len(assignment) < len(self.variables) and self.variables[len(assignment)] not in assignment:
+            return self.variables[len(assignment)]
         for variable in self.variables:
             if variable not in assignment:
                 return variable
 
     def is_complete(self, assignment):
-        for variable in self.variables:
-            if variable not in assignment:
-                return False
-        return True
+        return len(assignment) == len(self.variables)
 
     def order_domain_values(self, variable, assignment):
         all_values = self.domains[variable][:]
         # shuffle(all_values)
+        if self.value_ordering == 'lcv':
+            all_values.sort(key=lambda value: self.ruled_out(variable, value, assignment))
         return all_values
 
+    def ruled_out(self, variable, value, assignment):
+        # How many still-open options of unassigned neighbours variable = value would remove
+        count = 0
+        for dependent in self.dependents[variable]:
+            if dependent in assignment:
+                continue
+            for option in self.conflicts[dependent]:
+                if self.is_available(dependent, option) and not self.satisfies(dependent, option, variable, value):
+                    count += 1
+        return count
+
+    def min_conflicts(self, max_seconds=10.0, max_steps=None, tabu_tenure=0, restart_after=None, seed=None):
+        # Local search over complete assignments. Returns (assignment, conflicts), where
+        # conflicts counts violated (variable, neighbour) checks and is 0 for a solution.
+        rng = random.Random(seed)
+        self.init_graph()
+        self.stats = {'steps': 0, 'restarts': 0, 'conflicts': None}
+        deadline = time.perf_counter() + max_seconds
+        best_assignment, best_total = None, None
+
+        while True:
+            assignment = self.greedy_assignment(rng)
+            # violations[v]: neighbours whose check against v fails, from v's side
+            violations = {v: self.count_violations(v, assignment[v], assignment) for v in self.variables}
+            conflicted = ConflictSet(v for v in self.variables if violations[v])
+            total = sum(violations.values())
+            run_best, since_improvement = total, 0
+            tabu = {}
+
+            while total and time.perf_counter() < deadline:
+                if max_steps is not None and self.stats['steps'] >= max_steps:
+                    break
+                if restart_after is not None and since_improvement >= restart_after:
+                    break
+                self.stats['steps'] += 1
+                step = self.stats['steps']
+
+                variable = conflicted.choice(rng)
+                current = assignment[variable]
+                current_cost = self.move_cost(variable, current, assignment)
+                best_values, best_cost = [], None
+                for value in self.domains[variable]:
+                    if value == current:
+                        continue
+                    cost = self.move_cost(variable, value, assignment)
+                    # Tabu moves are allowed only when they beat the best total seen in this run
+                    if tabu.get((variable, value), 0) > step and total + cost - current_cost >= run_best:
+                        continue
+                    if best_cost is None or cost < best_cost:
+                        best_values, best_cost = [value], cost
+                    elif cost == best_cost:
+                        best_values.append(value)
+                if not best_values:
+                    continue
+
+                value = rng.choice(best_values)
+                total += self.move(variable, value, assignment, violations, conflicted)
+                if tabu_tenure:
+                    tabu[(variable, current)] = step + tabu_tenure
+                if total < run_best:
+                    run_best, since_improvement = total, 0
+                else:
+                    since_improvement += 1
+
+            if best_total is None or total < best_total:
+                best_assignment, best_total = assignment, total
+            out_of_budget = (time.perf_counter() >= deadline
+                             or (max_steps is not None and self.stats['steps'] >= max_steps))
+            if best_total == 0 or restart_after is None or out_of_budget:
+                break
+            self.stats['restarts'] += 1
+
+        self.stats['conflicts'] = best_total
+        return best_assignment, best_total
+
+    def greedy_assignment(self, rng):
+        # Each variable takes a value with the fewest conflicts against those placed before it
+        assignment = {}
+        for variable in self.variables:
+            costs = {value: self.count_violations(variable, value, assignment) for value in self.domains[variable]}
+            lowest = min(costs.values())
+            assignment[variable] = rng.choice([value for value, cost in costs.items() if cost == lowest])
+        return assignment
+
+    def count_violations(self, variable, value, assignment):
+        count = 0
+        for neighbour in self.neighbours[variable]:
+            if neighbour in assignment and not self.satisfies(variable, value, neighbour, assignment[neighbour]):
+                count += 1
+        return count
+
+    def move_cost(self, variable, value, assignment):
+        # Violations involving variable if it took value: its own checks plus its dependents'
+        cost = self.count_violations(variable, value, assignment)
+        for dependent in self.dependents[variable]:
+            if not self.satisfies(dependent, assignment[dependent], variable, value):
+                cost += 1
+        return cost
+
+    def move(self, variable, value, assignment, violations, conflicted):
+        # O(degree) update of the violation counts; returns the change in the total
+        old_value = assignment[variable]
+        assignment[variable] = value
+        change = 0
+        for dependent in self.dependents[variable]:
+            before = not self.satisfies(dependent, assignment[dependent], variable, old_value)
+            after = not self.satisfies(dependent, assignment[dependent], variable, value)
+            if before != after:
+                violations[dependent] += after - before
+                change += after - before
+                conflicted.update(dependent, violations[dependent])
+        own = self.count_violations(variable, value, assignment)
+        change += own - violations[variable]
+        violations[variable] = own
+        conflicted.update(variable, own)
+        return change
+
     def is_consistent(self, variable, value, assignment):
         if not assignment:
             return True
@@ -54,6 +524,188 @@ class CSP:
                     return False
         return True
 
+    def compile(self):
+        return CompiledCSP(self)
+
+
+_worker = {}
+
+
+def _init_worker(csp, stop, options):
+    _worker['csp'] = csp
+    _worker['stop'] = stop
+    _worker['options'] = options
+
+
+def _solve_subproblem(prefix):
+    csp, stop, mode = _worker['csp'], _worker['stop'], _worker['options']['mode']
+    csp.stats = {'nodes': 0, 'backtracks': 0}
+    csp.init_counters()
+    assignment = {}
+    for variable, value in prefix:
+        csp.assign(variable, value, assignment)
+        if not csp.infer(variable, assignment):
+            return {'first': False, 'count': 0, 'all': []}[mode]
+    result = csp.iterative_backtracking(assignment, stop, mode)
+    if result is None:
+        return False
+    return dict(result) if mode == 'first' and result else result
+
+
+def _solve_component(component):
+    return _worker['csp'].solve_component(component, _worker['options'])
+
+
+class ConflictSet:
+    # Set with O(1) add, remove and uniform random choice
+    def __init__(self, items=()):
+        self.items = []
+        self.index = {}
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, item):
+        if item not in self.index:
+            self.index[item] = len(self.items)
+            self.items.append(item)
+
+    def remove(self, item):
+        position = self.index.pop(item, None)
+        if position is None:
+            return
+        last = self.items.pop()
+        if position < len(self.items):
+            self.items[position] = last
+            self.index[last] = position
+
+    def update(self, item, count):
+        if count:
+            self.add(item)
+        else:
+            self.remove(item)
+
+    def choice(self, rng):
+        return self.items[rng.randrange(len(self.items))]
+
+
+class CompiledCSP:
+    # Integer-encoded form of a CSP whose constraints are all pairwise "!=".
+    # Variables and values become indices, neighbours become index tuples and each
+    # domain is a bitset (bit i set = value i allowed), so checks are bit operations.
+    def __init__(self, csp):
+        if not is_inequality_csp(csp):
+            raise ValueError("CompiledCSP only supports pairwise inequality constraints")
+        self.variables = list(csp.variables)
+        self.index = {variable: i for i, variable in enumerate(self.variables)}
+        self.values = []
+        value_index = {}
+        for variable in self.variables:
+            for value in csp.domains[variable]:
+                if value not in value_index:
+                    value_index[value] = len(self.values)
+                    self.values.append(value)
+        self.domains = [sum(1 << value_index[value] for value in set(csp.domains[variable]))
+                        for variable in self.variables]
+        # "!=" holds both ways, so a value is removed from both ends of every listed pair
+        adjacent = [set() for _ in self.variables]
+        if csp.constraints:
+            for variable in self.variables:
+                for neighbour in csp.neighbours[variable]:
+                    adjacent[self.index[variable]].add(self.index[neighbour])
+                    adjacent[self.index[neighbour]].add(self.index[variable])
+        self.neighbours = [tuple(sorted(others)) for others in adjacent]
+        self.stats = {'nodes': 0, 'backtracks': 0}
+
+    def backtracking_search(self):
+        # Forward checking on the domain bitsets: assigning a value clears its bit in every
+        # unassigned neighbour, and the trail of (variable, bit) removals is replayed backwards
+        # on backtrack. The next variable is the one with the fewest bits left (MRV, ties
+        # broken by most neighbours), taken from a lazy heap like CSP.mrv_heap.
+        n = len(self.variables)
+        neighbours = self.neighbours
+        domains = list(self.domains)
+        assignment = [-1] * n
+        trail = []
+        heap = [(domains[v].bit_count(), -len(neighbours[v]), v) for v in range(n)]
+        heapq.heapify(heap)
+        self.stats = {'nodes': 0, 'backtracks': 0}
+
+        def push(variable):
+            nonlocal heap
+            heapq.heappush(heap, (domains[variable].bit_count(), -len(neighbours[variable]), variable))
+            if len(heap) > 4 * n + 64:
+                heap = [(domains[v].bit_count(), -len(neighbours[v]), v) for v in range(n) if assignment[v] < 0]
+                heapq.heapify(heap)
+
+        def select():
+            while True:
+                size, _, variable = heap[0]
+                if assignment[variable] < 0 and size == domains[variable].bit_count():
+                    return variable
+                heapq.heappop(heap)
+
+        if n == 0:
+            return {}
+        variable = select()
+        stack = [[variable, domains[variable], len(trail)]]
+        assigned = 0
+        while stack:
+            frame = stack[-1]
+            variable, remaining, mark = frame
+            if assignment[variable] >= 0:
+                # Coming back to this frame: retract the value tried last time
+                while len(trail) > mark:
+                    neighbour, bit = trail.pop()
+                    domains[neighbour] |= bit
+                    push(neighbour)
+                assignment[variable] = -1
+                assigned -= 1
+                push(variable)
+            if not remaining:
+                stack.pop()
+                self.stats['backtracks'] += 1
+                continue
+            lowest = remaining & -remaining
+            frame[1] = remaining ^ lowest
+            assignment[variable] = lowest.bit_length() - 1
+            assigned += 1
+            self.stats['nodes'] += 1
+
+            wiped_out = False
+            for neighbour in neighbours[variable]:
+                if assignment[neighbour] < 0 and domains[neighbour] & lowest:
+                    domains[neighbour] ^= lowest
+                    trail.append((neighbour, lowest))
+                    if not domains[neighbour]:
+                        wiped_out = True
+                        break
+                    push(neighbour)
+            if wiped_out:
+                continue
+            if assigned == n:
+                return {self.variables[i]: self.values[v] for i, v in enumerate(assignment)}
+            variable = select()
+            stack.append([variable, domains[variable], len(trail)])
+        return False
+
+
+def is_inequality_csp(csp):
+    # Probes every distinct constraint function on every constrained pair of variables,
+    # in both directions, with every pair of values from their domains
+    constraints = {id(c): c for c in csp.constraints.values()}.values()
+    for variable in csp.variables:
+        for neighbour in csp.neighbours[variable]:
+            for first_value in csp.domains[variable]:
+                for second_value in csp.domains[neighbour]:
+                    expected = first_value != second_value
+                    for constraint in constraints:
+                        if constraint(variable, first_value, neighbour, second_value) != expected:
+                            return False
+    return True
+
 
 def create_australia_csp():
     wa, q, t, v, sa, nt, nsw = 'WA', 'Q', 'T', 'V', 'SA', 'NT', 'NSW'
@@ -159,8 +811,25 @@ def create_southamerica_csp():
 if __name__ == '__main__':
     continent = create_australia_csp()
     continent = create_southamerica_csp()
-    result = continent.backtracking_search()
+    result = continent.compile().backtracking_search()
     for area, color in sorted(result.items()):
         print("{}: {}".format(area, color))
 
+    australia = create_australia_csp()
+    print("Australia components:", australia.connected_components())
+    print("Solved by components:", australia.solve_by_components(variable_ordering='mrv'))
+
+    for variable_ordering, value_ordering, inference in [('static', 'static', 'none'),
+                                                         ('mrv', 'lcv', 'forward_checking'),
+                                                         ('mrv', 'lcv', 'mac')]:
+        continent.backtracking_search(variable_ordering, value_ordering, inference)
+        print("{}/{}/{}: {} nodes, {} backtracks".format(
+            variable_ordering, value_ordering, inference, continent.stats['nodes'], continent.stats['backtracks']))
+
+    solutions = continent.parallel_search(processes=4, split_depth=2, mode='count', variable_ordering='mrv')
+    print("parallel search: {} solutions".format(solutions))
+
+    assignment, conflicts = continent.min_conflicts(max_seconds=1.0, tabu_tenure=5, restart_after=200, seed=0)
+    print("min-conflicts: {} conflicts left after {} steps".format(conflicts, continent.stats['steps']))
+
     # Check at https://mapchart.net/australia.html
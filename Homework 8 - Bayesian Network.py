@@ -1,4 +1,8 @@
 import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 
 # Prior probabilities
 P_DT = {'true': 0.3, 'false': 0.7}
@@ -29,6 +33,17 @@ P_HC_given_DT_FTL_EM = {
     ('false', 'false', 'false'): {'true': 0.01, 'false': 0.99}
 }
 
+# Network structure: variable -> (parents, CPT). CPT rows are keyed by the parent values
+# in the order listed (a bare value for a single parent), priors have no parents.
+network = {
+    'DT': ((), P_DT),
+    'EM': ((), P_EM),
+    'FTL': ((), P_FTL),
+    'V': (('DT',), P_V_given_DT),
+    'SMS': (('DT', 'EM'), P_SMS_given_DT_EM),
+    'HC': (('DT', 'FTL', 'EM'), P_HC_given_DT_FTL_EM),
+}
+
 # Evidence
 evidence = {
     'V': 'false',       # Vibrations
@@ -47,39 +62,473 @@ variable_names = {
 }
 
 
-def joint_probability(DT_val, EM_val, FTL_val, evidence):
-    p = 1.0
-    p *= P_DT[DT_val]
-    p *= P_EM[EM_val]
-    p *= P_FTL[FTL_val]
-    p *= P_V_given_DT[DT_val][evidence['V']]
-    p *= P_SMS_given_DT_EM[(DT_val, EM_val)][evidence['SMS']]
-    p *= P_HC_given_DT_FTL_EM[(DT_val, FTL_val, EM_val)][evidence['HC']]
-    return p
+class Factor:
+    def __init__(self, variables, table):
+        self.variables = tuple(variables)
+        self.table = np.asarray(table, dtype=float)
 
+    def aligned(self, variables):
+        # View of the table with one axis per entry in variables (size 1 where absent)
+        present = [v for v in variables if v in self.variables]
+        table = np.transpose(self.table, [self.variables.index(v) for v in present])
+        shape = [table.shape[present.index(v)] if v in self.variables else 1 for v in variables]
+        return table.reshape(shape)
 
-def compute_posterior(query_var):
-    posterior = {}
-    total = 0.0
+    def multiply(self, other):
+        variables = self.variables + tuple(v for v in other.variables if v not in self.variables)
+        return Factor(variables, self.aligned(variables) * other.aligned(variables))
 
-    for query_val in ['true', 'false']:
-        prob = 0.0
-        for DT_val, EM_val, FTL_val in itertools.product(['true', 'false'], repeat=3):
-            if query_var == 'DT' and DT_val != query_val:
-                continue
-            if query_var == 'EM' and EM_val != query_val:
-                continue
-            if query_var == 'FTL' and FTL_val != query_val:
+    def sum_out(self, variable):
+        axis = self.variables.index(variable)
+        return Factor(self.variables[:axis] + self.variables[axis + 1:], self.table.sum(axis=axis))
+
+    def reduce(self, variable, index):
+        axis = self.variables.index(variable)
+        return Factor(self.variables[:axis] + self.variables[axis + 1:], np.take(self.table, index, axis=axis))
+
+
+def variable_domains(network):
+    domains = {}
+    for var, (parents, cpt) in network.items():
+        row = cpt if not parents else next(iter(cpt.values()))
+        domains[var] = list(row)
+    return domains
+
+
+def cpt_to_factor(var, parents, cpt, domains):
+    table = np.zeros([len(domains[p]) for p in parents] + [len(domains[var])])
+    for index in itertools.product(*(range(len(domains[p])) for p in parents)):
+        values = tuple(domains[p][i] for p, i in zip(parents, index))
+        row = cpt if not parents else cpt[values[0] if len(values) == 1 else values]
+        table[index] = [row[value] for value in domains[var]]
+    return Factor(parents + (var,), table)
+
+
+def network_factors(network):
+    domains = variable_domains(network)
+    return [cpt_to_factor(var, parents, cpt, domains) for var, (parents, cpt) in network.items()], domains
+
+
+def elimination_order(factors, hidden, heuristic='min-fill'):
+    return [var for var, _ in greedy_elimination(factors, hidden, heuristic)]
+
+
+def greedy_elimination(factors, hidden, heuristic='min-fill'):
+    # Greedy order on the interaction graph: each step eliminates the variable that adds the
+    # fewest fill-in edges ('min-fill') or has the fewest neighbours ('min-degree').
+    # Yields each variable with its neighbours at the time it is eliminated.
+    graph = {}
+    for factor in factors:
+        for var in factor.variables:
+            graph.setdefault(var, set()).update(v for v in factor.variables if v != var)
+
+    def cost(var):
+        neighbours = graph[var]
+        if heuristic == 'min-degree':
+            return len(neighbours)
+        return sum(1 for a, b in itertools.combinations(neighbours, 2) if b not in graph[a])
+
+    remaining = set(hidden) & set(graph)
+    while remaining:
+        var = min(remaining, key=lambda v: (cost(v), v))
+        neighbours = graph.pop(var)
+        for a in neighbours:
+            graph[a].discard(var)
+            graph[a].update(neighbours - {a})
+        remaining.remove(var)
+        yield var, neighbours
+
+
+def variable_elimination(factors, query_vars, evidence, domains, heuristic='min-fill'):
+    # Condition every factor on the evidence first, so evidence axes disappear. A query
+    # variable that is also observed keeps its axis and gets an indicator on its value.
+    reduced = []
+    for factor in factors:
+        for var, value in evidence.items():
+            if var in factor.variables and var not in query_vars:
+                factor = factor.reduce(var, domains[var].index(value))
+        reduced.append(factor)
+    for var in query_vars:
+        if var in evidence:
+            indicator = np.zeros(len(domains[var]))
+            indicator[domains[var].index(evidence[var])] = 1.0
+            reduced.append(Factor((var,), indicator))
+
+    table = eliminate(reduced, tuple(query_vars), heuristic)
+    return table / table.sum()
+
+
+def eliminate(factors, keep_vars, heuristic='min-fill'):
+    # Sums every variable except keep_vars out of the product of factors;
+    # returns the unnormalised table with one axis per keep_vars entry
+    scope = set(itertools.chain.from_iterable(f.variables for f in factors))
+    hidden = scope - set(keep_vars)
+    factors = list(factors)
+    for var in elimination_order(factors, hidden, heuristic):
+        related = [f for f in factors if var in f.variables]
+        factors = [f for f in factors if var not in f.variables]
+        product = related[0]
+        for factor in related[1:]:
+            product = product.multiply(factor)
+        factors.append(product.sum_out(var))
+
+    result = Factor((), 1.0)
+    for factor in factors:
+        result = result.multiply(factor)
+    return result.aligned(keep_vars)
+
+
+# Pseudo-variable that carries the record index through batched elimination
+ROW = '__row__'
+
+
+def encode_evidence(records, evidence_vars, domains):
+    # Records are dicts like the global evidence; absent or None values become -1 (missing)
+    rows = np.full((len(records), len(evidence_vars)), -1, dtype=np.int64)
+    for r, record in enumerate(records):
+        for c, var in enumerate(evidence_vars):
+            value = record.get(var)
+            if value is not None:
+                rows[r, c] = domains[var].index(value)
+    return rows
+
+
+def batch_posterior(network, evidence_vars, evidence_rows, query_vars, heuristic='min-fill'):
+    # evidence_rows: (R, len(evidence_vars)) value indices, -1 where a record has no reading.
+    # Returns (R, len(query_vars), largest query domain) posteriors from one elimination per
+    # query var; a variable with a smaller domain is padded with zeros past its last value.
+    factors, domains = get_factors(network)
+    evidence_rows = np.asarray(evidence_rows, dtype=np.int64)
+    n_rows = evidence_rows.shape[0]
+
+    # Per-row evidence enters as likelihood factors over (ROW, var); missing rows are all ones
+    batch_factors = list(factors)
+    for c, var in enumerate(evidence_vars):
+        observed = evidence_rows[:, c] >= 0
+        likelihood = np.ones((n_rows, len(domains[var])))
+        likelihood[observed] = 0.0
+        likelihood[observed, evidence_rows[observed, c]] = 1.0
+        batch_factors.append(Factor((ROW, var), likelihood))
+
+    width = max((len(domains[var]) for var in query_vars), default=0)
+    posteriors = np.zeros((n_rows, len(query_vars), width))
+    for q, var in enumerate(query_vars):
+        table = eliminate(batch_factors, (ROW, var), heuristic=heuristic)
+        table = np.broadcast_to(table, (n_rows, len(domains[var])))
+        posteriors[:, q, :len(domains[var])] = table / table.sum(axis=1, keepdims=True)
+    return posteriors
+
+
+compiled_factors = {}
+
+
+def get_factors(network):
+    # CPT arrays are built once per network contents (see network_key)
+    key = network_key(network)
+    if key not in compiled_factors:
+        compiled_factors[key] = network_factors(network)
+    return compiled_factors[key]
+
+
+class JunctionTree:
+    # Compiled once per network; evidence changes only invalidate the messages that
+    # flow away from the clique holding the changed variable.
+    def __init__(self, network, heuristic='min-fill'):
+        factors, self.domains = network_factors(network)
+
+        # Triangulate by eliminating every variable; the maximal elimination cliques
+        # of a triangulated graph form the junction tree nodes
+        candidates = [frozenset(neighbours | {var})
+                      for var, neighbours in greedy_elimination(factors, self.domains, heuristic)]
+        self.cliques = []
+        for clique in sorted(candidates, key=len, reverse=True):
+            if not any(clique <= kept for kept in self.cliques):
+                self.cliques.append(clique)
+
+        # Maximum-weight spanning tree on separator sizes (Kruskal)
+        root = list(range(len(self.cliques)))
+
+        def find(i):
+            while root[i] != i:
+                root[i] = root[root[i]]
+                i = root[i]
+            return i
+
+        self.neighbours = {i: [] for i in range(len(self.cliques))}
+        pairs = sorted(itertools.combinations(range(len(self.cliques)), 2),
+                       key=lambda ij: len(self.cliques[ij[0]] & self.cliques[ij[1]]), reverse=True)
+        for i, j in pairs:
+            if find(i) != find(j):
+                root[find(i)] = find(j)
+                self.neighbours[i].append(j)
+                self.neighbours[j].append(i)
+
+        # Each CPT goes into one clique covering its scope
+        self.potentials = [Factor(sorted(c), np.ones([len(self.domains[v]) for v in sorted(c)]))
+                           for c in self.cliques]
+        for factor in factors:
+            home = min((i for i, c in enumerate(self.cliques) if set(factor.variables) <= c),
+                       key=lambda i: len(self.cliques[i]))
+            self.potentials[home] = self.potentials[home].multiply(factor)
+
+        # Smallest clique for reading each variable's marginal and entering its evidence
+        self.home = {var: min((i for i, c in enumerate(self.cliques) if var in c),
+                              key=lambda i: len(self.cliques[i]))
+                     for var in self.domains}
+        self.evidence = {}
+        self.messages = {}
+
+    def set_evidence(self, var, value):
+        # value=None retracts the evidence on var
+        if self.evidence.get(var) == value:
+            return
+        if value is None:
+            del self.evidence[var]
+        else:
+            self.evidence[var] = value
+        self._invalidate_from(self.home[var])
+
+    def update_evidence(self, evidence):
+        for var in set(self.evidence) - set(evidence):
+            self.set_evidence(var, None)
+        for var, value in evidence.items():
+            self.set_evidence(var, value)
+
+    def _invalidate_from(self, start):
+        stack = [(start, None)]
+        while stack:
+            i, parent = stack.pop()
+            for j in self.neighbours[i]:
+                if j != parent:
+                    self.messages.pop((i, j), None)
+                    stack.append((j, i))
+
+    def _local(self, i):
+        potential = self.potentials[i]
+        for var, value in self.evidence.items():
+            if self.home[var] == i:
+                indicator = np.zeros(len(self.domains[var]))
+                indicator[self.domains[var].index(value)] = 1.0
+                potential = potential.multiply(Factor((var,), indicator))
+        return potential
+
+    def _belief(self, i, exclude=None):
+        belief = self._local(i)
+        for k in self.neighbours[i]:
+            if k != exclude:
+                belief = belief.multiply(self.messages[(k, i)])
+        return belief
+
+    def calibrate(self):
+        # Collect towards clique 0, then distribute; messages still cached are reused
+        order, parent = [], {0: None}
+        stack = [0]
+        while stack:
+            i = stack.pop()
+            order.append(i)
+            for j in self.neighbours[i]:
+                if j not in parent:
+                    parent[j] = i
+                    stack.append(j)
+        edges = [(i, parent[i]) for i in reversed(order) if parent[i] is not None]
+        edges += [(parent[i], i) for i in order if parent[i] is not None]
+
+        for i, j in edges:
+            if (i, j) in self.messages:
                 continue
-            prob += joint_probability(DT_val, EM_val, FTL_val, evidence)
+            message = self._belief(i, exclude=j)
+            for var in set(message.variables) - self.cliques[j]:
+                message = message.sum_out(var)
+            message.table = message.table / message.table.sum()
+            self.messages[(i, j)] = message
+
+    def marginals(self):
+        self.calibrate()
+        result = {}
+        beliefs = {}
+        for var, i in self.home.items():
+            if i not in beliefs:
+                beliefs[i] = self._belief(i)
+            belief = beliefs[i]
+            for other in set(belief.variables) - {var}:
+                belief = belief.sum_out(other)
+            table = belief.table / belief.table.sum()
+            result[var] = dict(zip(self.domains[var], table))
+        return result
+
+
+def network_key(network):
+    # Hashable snapshot of the structure and every CPT entry (in order, since the order of
+    # a CPT row defines the variable's domain). Unlike id(network), it cannot be reused
+    # by a later network and it changes when a CPT is edited in place.
+    def freeze(table):
+        return tuple((key, freeze(value) if isinstance(value, dict) else value)
+                     for key, value in table.items())
+    return tuple((var, tuple(parents), freeze(cpt)) for var, (parents, cpt) in network.items())
+
+
+junction_trees = {}
+
+
+def get_junction_tree(network):
+    # Compiled trees are cached per network contents
+    key = network_key(network)
+    if key not in junction_trees:
+        junction_trees[key] = JunctionTree(network)
+    return junction_trees[key]
+
+
+def topological_order(network):
+    order, placed = [], set()
+    pending = list(network)
+    while pending:
+        ready = [v for v in pending if set(network[v][0]) <= placed]
+        if not ready:
+            raise ValueError("Network has a cycle")
+        for var in ready:
+            order.append(var)
+            placed.add(var)
+        pending = [v for v in pending if v not in placed]
+    return order
+
+
+def sampling_model(network):
+    # Picklable description for the sampling workers: CPT arrays indexed [parent values..., value]
+    factors, domains = get_factors(network)
+    tables = {f.variables[-1]: f.table for f in factors}
+    parents = {var: network[var][0] for var in network}
+    children = {var: [c for c in network if var in parents[c]] for var in network}
+    return {'order': topological_order(network), 'parents': parents, 'children': children,
+            'tables': tables, 'domains': domains}
 
-        posterior[query_val] = prob
-        total += prob
 
-    for k in posterior:
-        posterior[k] /= total
+def _conditional(model, var, samples):
+    # P(var | parents) for every sample, shape (n, domain size)
+    index = tuple(samples[p] for p in model['parents'][var])
+    return model['tables'][var][index] if index else model['tables'][var][None, :]
 
-    return posterior
+
+def _draw(rng, probs):
+    probs = probs / probs.sum(axis=1, keepdims=True)
+    u = rng.random(probs.shape[0])[:, None]
+    return np.minimum((probs.cumsum(axis=1) < u).sum(axis=1), probs.shape[1] - 1)
+
+
+def _likelihood_weighting_chunk(model, query_var, evidence_idx, n_samples, rng, state):
+    samples = {}
+    weights = np.ones(n_samples)
+    for var in model['order']:
+        probs = np.broadcast_to(_conditional(model, var, samples), (n_samples, len(model['domains'][var])))
+        if var in evidence_idx:
+            samples[var] = np.full(n_samples, evidence_idx[var])
+            weights = weights * probs[:, evidence_idx[var]]
+        else:
+            samples[var] = _draw(rng, probs)
+    return samples[query_var], weights, state
+
+
+def _gibbs_chunk(model, query_var, evidence_idx, n_samples, rng, state):
+    # state holds the current value of every variable for a block of parallel chains
+    n_chains = next(iter(state.values())).shape[0]
+    hidden = [v for v in model['order'] if v not in evidence_idx]
+    values = np.empty((n_samples, n_chains), dtype=np.int64)
+    for step in range(n_samples):
+        for var in hidden:
+            # Markov blanket: own CPT times each child's CPT, for every candidate value
+            scores = np.broadcast_to(_conditional(model, var, state), (n_chains, len(model['domains'][var]))).copy()
+            for k in range(scores.shape[1]):
+                state[var] = np.full(n_chains, k)
+                for child in model['children'][var]:
+                    scores[:, k] *= _conditional(model, child, state)[np.arange(n_chains), state[child]]
+            state[var] = _draw(rng, scores)
+        values[step] = state[query_var]
+    return values.ravel(), np.ones(values.size), state
+
+
+def _sampling_worker(args):
+    method, model, query_var, evidence_idx, n_samples, rng, state = args
+    chunk = _gibbs_chunk if method == 'gibbs' else _likelihood_weighting_chunk
+    values, weights, state = chunk(model, query_var, evidence_idx, n_samples, rng, state)
+    size = len(model['domains'][query_var])
+    sums = np.bincount(values, weights=weights, minlength=size)
+    squares = np.bincount(values, weights=weights ** 2, minlength=size)
+    return sums, squares, len(values), rng, state
+
+
+def sample_posterior(network, query_var, evidence, method='likelihood', n_chains=4, samples_per_round=10000,
+                     max_rounds=100, target_se=None, burn_in=200, gibbs_block=32, seed=0, processes=None):
+    # Each round runs samples_per_round draws on every chain; stops early once the largest
+    # standard error of the posterior drops below target_se
+    model = sampling_model(network)
+    domains = model['domains']
+    evidence_idx = {var: domains[var].index(value) for var, value in evidence.items()}
+    rngs = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(n_chains)]
+
+    states = [None] * n_chains
+    if method == 'gibbs':
+        # Start every block of chains from a forward sample consistent with the evidence,
+        # then discard burn_in sweeps
+        for c in range(n_chains):
+            state = {}
+            for var in model['order']:
+                if var in evidence_idx:
+                    state[var] = np.full(gibbs_block, evidence_idx[var])
+                else:
+                    state[var] = _draw(rngs[c], np.broadcast_to(_conditional(model, var, state),
+                                                              (gibbs_block, len(domains[var]))))
+            _, _, states[c] = _gibbs_chunk(model, query_var, evidence_idx, burn_in, rngs[c], state)
+        samples_per_round = max(1, samples_per_round // gibbs_block)
+
+    size = len(domains[query_var])
+    batch_means = []
+    sums, squares, total = np.zeros(size), np.zeros(size), 0
+    started = time.perf_counter()
+    executor = ProcessPoolExecutor(processes) if processes and processes > 1 else None
+    try:
+        for round_number in range(1, max_rounds + 1):
+            jobs = [(method, model, query_var, evidence_idx, samples_per_round, rngs[c], states[c])
+                    for c in range(n_chains)]
+            results = executor.map(_sampling_worker, jobs) if executor else map(_sampling_worker, jobs)
+            for c, (chain_sums, chain_squares, n, rngs[c], states[c]) in enumerate(results):
+                sums += chain_sums
+                squares += chain_squares
+                total += n
+                batch_means.append(chain_sums / chain_sums.sum())
+
+            posterior = sums / sums.sum()
+            if method == 'gibbs':
+                # Batch means over (chain, round) blocks account for autocorrelation
+                se = np.std(batch_means, axis=0, ddof=1) / np.sqrt(len(batch_means))
+            else:
+                # Self-normalised importance sampling variance
+                weight_total, weight_squares = sums.sum(), squares.sum()
+                se = np.sqrt(np.maximum(squares * (1 - 2 * posterior) + posterior ** 2 * weight_squares, 0)) / weight_total
+            if target_se is not None and len(batch_means) > 1 and se.max() <= target_se:
+                break
+    finally:
+        if executor:
+            executor.shutdown()
+    elapsed = time.perf_counter() - started
+
+    if method == 'gibbs':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ess = float(np.nanmin(posterior * (1 - posterior) / se ** 2)) if se.max() > 0 else float(total)
+    else:
+        ess = float(sums.sum() ** 2 / squares.sum())
+    return {
+        'posterior': dict(zip(domains[query_var], posterior)),
+        'standard_error': dict(zip(domains[query_var], se)),
+        'samples': total,
+        'rounds': round_number,
+        'samples_per_sec': total / elapsed,
+        'ess': min(ess, float(total)),
+    }
+
+
+def compute_posterior(query_var):
+    factors, domains = get_factors(network)
+    table = variable_elimination(factors, [query_var], evidence, domains)
+    return dict(zip(domains[query_var], table))
 
 
 def main():
@@ -89,10 +538,14 @@ def main():
         print(f"  {full_name}: {evidence[ev_key].capitalize()}")
     print()
 
+    tree = get_junction_tree(network)
+    tree.update_evidence(evidence)
+    marginals = tree.marginals()
+
     posteriors = {}
     for var in ['DT', 'EM', 'FTL']:
         full_name = variable_names[var]
-        posterior = compute_posterior(var)
+        posterior = marginals[var]
         posteriors[var] = posterior['true']
         print(f"P({full_name} | evidence):")
         print(f"  Yes: {posterior['true']:.5f}")
@@ -109,6 +562,28 @@ def main():
     else:
         print("  No likely mechanical fault identified with >50% probability based on current evidence.")
 
+    # --- Batched telemetry records (None = no reading) ---
+    records = [
+        {'V': 'false', 'SMS': 'false', 'HC': 'true'},
+        {'V': 'true', 'SMS': None, 'HC': 'false'},
+        {'SMS': 'true'},
+    ]
+    evidence_vars = ['V', 'SMS', 'HC']
+    query_vars = ['DT', 'EM', 'FTL']
+    _, domains = get_factors(network)
+    rows = encode_evidence(records, evidence_vars, domains)
+    batch = batch_posterior(network, evidence_vars, rows, query_vars)
+    print("\nBatched P(Yes | record) for", ', '.join(variable_names[v] for v in query_vars))
+    for record, posterior in zip(records, batch):
+        print(f"  {record}: {' '.join(f'{p:.4f}' for p in posterior[:, 0])}")
+
+    # --- Sampling estimates for comparison ---
+    print("\nApproximate P(Fuel Tank Leaking = Yes | evidence):")
+    for method in ['likelihood', 'gibbs']:
+        run = sample_posterior(network, 'FTL', evidence, method=method, target_se=0.005, seed=42)
+        print(f"  {method:10s}: {run['posterior']['true']:.4f} +/- {run['standard_error']['true']:.4f} "
+              f"({run['samples']} samples, {run['samples_per_sec']:.0f} samples/s, ESS {run['ess']:.0f})")
+
 
 if __name__ == '__main__':
     main()
@@ -1,3 +1,7 @@
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 
 def main():
@@ -29,69 +33,502 @@ def main():
     prob = compute_forward(start_probs, transitions, emissions, obs_sequence, end_probs)
     print("Observation Sequence Probability (Forward):", prob)
 
+    batch = [obs_sequence, obs_sequence[:2], [3, 3, 1]]
+    log_likelihoods = compute_forward_batch(start_probs, transitions, emissions, batch, end_probs)
+    print("Batch Log-Likelihoods (Forward):", log_likelihoods)
+
+    banded = BandedTransitions.from_dense(transitions, offsets=(-1, 0, 1))
+    print("Observation Sequence Probability (Forward, banded):",
+          compute_forward(start_probs, banded, emissions, obs_sequence, end_probs))
+
     path = compute_viterbi_log(start_probs, transitions, emissions, obs_sequence, end_probs, states)
     print("Most Likely State Sequence (Viterbi):", ' '.join(path))
 
+    paths, _ = compute_viterbi_batch(start_probs, transitions, emissions, batch, end_probs)
+    for seq, path_indices in zip(batch, paths):
+        print("  Batch Viterbi", ' '.join(map(str, seq)), "->", ' '.join(states[path_indices]))
+
+    print("\nStreaming (filtered P(hot), fixed-lag smoothed P(hot), online Viterbi):")
+    filtered = filter_stream(start_probs, transitions, emissions, iter(obs_sequence))
+    for t, belief in enumerate(filtered):
+        print(f"  t={t} obs={obs_sequence[t]} filtered={belief[0]:.4f}")
+    for t, belief in fixed_lag_smoother(start_probs, transitions, emissions, iter(obs_sequence), lag=1):
+        print(f"  t={t} smoothed={belief[0]:.4f}")
+    committed = online_viterbi(start_probs, transitions, emissions, iter(obs_sequence), end_probs)
+    print("  Online Viterbi:", ' '.join(states[s] for _, s in committed))
+
+    print("\nBaum-Welch on the batch:")
+    start_probs, transitions, emissions, end_probs, history = baum_welch(
+        batch, start_probs, transitions, emissions, end_probs, max_iter=10, verbose=True)
+    print("Converged:", history[-1]['converged'])
+    print("Trained transitions:\n", transitions)
+    print("Trained emissions:\n", emissions)
+
+
+class BandedTransitions:
+    # bands[k][i] = P(i -> i + offsets[k]); a left-to-right model uses offsets like (0, 1, 2)
+    def __init__(self, offsets, bands):
+        self.offsets = tuple(int(o) for o in offsets)
+        self.bands = np.asarray(bands, dtype=float)
+        self.shape = (self.bands.shape[1], self.bands.shape[1])
+
+    @classmethod
+    def from_dense(cls, transitions, offsets):
+        n_states = transitions.shape[0]
+        bands = np.zeros((len(offsets), n_states))
+        for k, offset in enumerate(offsets):
+            src = np.arange(max(0, -offset), min(n_states, n_states - offset))
+            bands[k, src] = transitions[src, src + offset]
+        return cls(offsets, bands)
+
+    def toarray(self):
+        n_states = self.shape[0]
+        dense = np.zeros(self.shape)
+        for offset, band in zip(self.offsets, self.bands):
+            src = np.arange(max(0, -offset), min(n_states, n_states - offset))
+            dense[src, src + offset] = band[src]
+        return dense
+
+
+def _band_slices(offset, n_states):
+    # (source states, destination states) covered by one diagonal
+    if offset >= 0:
+        return slice(0, n_states - offset), slice(offset, n_states)
+    return slice(-offset, n_states), slice(0, n_states + offset)
+
+
+def _is_sparse(transitions):
+    # scipy.sparse matrices/arrays, without importing scipy for dense models
+    return hasattr(transitions, 'tocsc')
+
+
+def propagate(alpha, transitions):
+    # alpha (B, N) @ transitions, in O(nnz) for banded and sparse transitions
+    if isinstance(transitions, BandedTransitions):
+        out = np.zeros_like(alpha)
+        for offset, band in zip(transitions.offsets, transitions.bands):
+            src, dst = _band_slices(offset, alpha.shape[1])
+            out[:, dst] += alpha[:, src] * band[src]
+        return out
+    if _is_sparse(transitions):
+        return np.asarray((transitions.T @ alpha.T).T)
+    return alpha @ transitions
+
+
+def propagate_back(beta, transitions):
+    # beta (B, N) @ transitions.T
+    if isinstance(transitions, BandedTransitions):
+        out = np.zeros_like(beta)
+        for offset, band in zip(transitions.offsets, transitions.bands):
+            src, dst = _band_slices(offset, beta.shape[1])
+            out[:, src] += beta[:, dst] * band[src]
+        return out
+    if _is_sparse(transitions):
+        return np.asarray((transitions @ beta.T).T)
+    return beta @ transitions.T
+
+
+def log_transitions(transitions):
+    # Sparse results keep only the stored entries; missing ones mean log(0) = -inf
+    if isinstance(transitions, BandedTransitions):
+        return BandedTransitions(transitions.offsets, np.log(transitions.bands + 1e-12))
+    if _is_sparse(transitions):
+        log_trans = transitions.tocsc(copy=True)
+        log_trans.sum_duplicates()
+        log_trans.data = np.log(log_trans.data + 1e-12)
+        return log_trans
+    return np.log(transitions + 1e-12)
+
+
+def max_predecessors(viterbi, log_trans):
+    # For every destination state: best score over predecessors (B, N) and its argmax
+    B, n_states = viterbi.shape
+    if isinstance(log_trans, BandedTransitions):
+        best = np.full((B, n_states), -np.inf)
+        best_prev = np.zeros((B, n_states), dtype=np.int64)
+        for offset, band in zip(log_trans.offsets, log_trans.bands):
+            src, dst = _band_slices(offset, n_states)
+            candidate = viterbi[:, src] + band[src]
+            better = candidate > best[:, dst]
+            best[:, dst] = np.where(better, candidate, best[:, dst])
+            best_prev[:, dst] = np.where(better, np.arange(n_states)[src], best_prev[:, dst])
+        return best, best_prev
+
+    if _is_sparse(log_trans):
+        # Columns of the CSC matrix list each state's predecessors; reduce each segment
+        indptr, indices = log_trans.indptr, log_trans.indices
+        counts = np.diff(indptr)
+        filled = counts > 0
+        starts = indptr[:-1][filled]
+        scores = viterbi[:, indices] + log_trans.data
+        best = np.full((B, n_states), -np.inf)
+        best[:, filled] = np.maximum.reduceat(scores, starts, axis=1)
+        column = np.repeat(np.arange(n_states), counts)
+        position = np.where(scores == best[:, column], np.arange(scores.shape[1]), scores.shape[1])
+        best_prev = np.zeros((B, n_states), dtype=np.int64)
+        best_prev[:, filled] = indices[np.minimum.reduceat(position, starts, axis=1)]
+        return best, best_prev
+
+    scores = viterbi[:, :, None] + log_trans[None, :, :]
+    best_prev = scores.argmax(axis=1)
+    best = np.take_along_axis(scores, best_prev[:, None, :], axis=1)[:, 0, :]
+    return best, best_prev
+
 
 def compute_forward(start_probs, transitions, emissions, observations, end_probs):
-    n_states = transitions.shape[0]
-    T = len(observations)
-    forward = np.zeros((n_states, T))
+    log_likelihood = compute_forward_batch(start_probs, transitions, emissions, [observations], end_probs)[0]
+    return np.exp(log_likelihood)
+
+
+def pad_sequences(sequences, pad_value=1):
+    lengths = np.array([len(seq) for seq in sequences], dtype=np.int64)
+    padded = np.full((len(sequences), lengths.max(initial=0)), pad_value, dtype=np.int64)
+    for b, seq in enumerate(sequences):
+        padded[b, :len(seq)] = seq
+    return padded, lengths
+
+
+def as_batch(observations, lengths, n_symbols):
+    # observations: padded (B, T) array of 1-indexed symbols, or a list of sequences
+    if lengths is None:
+        if isinstance(observations, np.ndarray) and observations.ndim == 2:
+            lengths = np.full(observations.shape[0], observations.shape[1], dtype=np.int64)
+        else:
+            observations, lengths = pad_sequences(observations)
+    observations = np.asarray(observations, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+
+    # Padding positions may hold anything, so only they are replaced by a valid symbol
+    # (0-indexed); a symbol outside 1..n_symbols inside a sequence is an error
+    in_sequence = np.arange(observations.shape[1]) < lengths[:, None]
+    obs_idx = np.where(in_sequence, observations - 1, 0)
+    invalid = (obs_idx < 0) | (obs_idx >= n_symbols)
+    if invalid.any():
+        b, t = np.argwhere(invalid)[0]
+        raise ValueError(f"Observation {observations[b, t]} at sequence {b}, position {t} "
+                         f"is not a symbol in 1..{n_symbols}")
+    return obs_idx, lengths
+
+
+def safe_scale(scale):
+    # A zero scale means the sequence is impossible; dividing by 1 instead leaves its alpha at 0
+    # rather than producing 0/0, and its log-likelihood still picks up log(0) = -inf
+    return np.where(scale > 0, scale, 1.0)
 
-    # Initialization
-    for s in range(n_states):
-        forward[s][0] = start_probs[s] * emissions[s][observations[0] - 1]
 
-    # Recursion
+def log_scale(scale):
+    with np.errstate(divide='ignore'):
+        return np.log(scale)
+
+
+def compute_forward_batch(start_probs, transitions, emissions, observations, end_probs, lengths=None):
+    obs_idx, lengths = as_batch(observations, lengths, emissions.shape[1])
+    T = obs_idx.shape[1]
+    emissions_T = emissions.T  # rows = observation, cols = state
+
+    # Initialization (alpha is rescaled to sum to 1 each step, log of the scale is accumulated)
+    alpha = start_probs[None, :] * emissions_T[obs_idx[:, 0]]
+    scale = alpha.sum(axis=1)
+    log_likelihood = log_scale(scale)
+    alpha /= safe_scale(scale)[:, None]
+
+    # Recursion: one (B, N) x (N, N) product per time step
     for t in range(1, T):
-        for s in range(n_states):
-            forward[s][t] = sum(
-                forward[sp][t - 1] * transitions[sp][s]
-                for sp in range(n_states)
-            ) * emissions[s][observations[t] - 1]
+        active = t < lengths
+        if not active.any():
+            break
+        step = propagate(alpha, transitions) * emissions_T[obs_idx[:, t]]
+        scale = step.sum(axis=1)
+        scale = np.where(active, scale, 1.0)
+        alpha = np.where(active[:, None], step / safe_scale(scale)[:, None], alpha)
+        log_likelihood += log_scale(scale)
 
     # Termination (account for transition to END)
-    prob = sum(forward[s][T - 1] * end_probs[s] for s in range(n_states))
-    return prob
+    log_likelihood += log_scale(alpha @ end_probs)
+    return np.where(lengths > 0, log_likelihood, 0.0)
+
+
+def compute_forward_scaled(start_probs, transitions, emissions, obs_idx, lengths):
+    # Same recursion as compute_forward_batch, but keeps every scaled alpha for the backward pass.
+    # Padding positions get alpha = 0 and scale = 1; an impossible sequence keeps alpha = 0 and scale = 0.
+    B, T = obs_idx.shape
+    emissions_T = emissions.T
+    alphas = np.zeros((B, T, transitions.shape[0]))
+    scales = np.ones((B, T))
+
+    alpha = start_probs[None, :] * emissions_T[obs_idx[:, 0]]
+    scales[:, 0] = alpha.sum(axis=1)
+    alpha /= safe_scale(scales[:, 0])[:, None]
+    alphas[:, 0] = alpha
+
+    for t in range(1, T):
+        active = t < lengths
+        step = propagate(alpha, transitions) * emissions_T[obs_idx[:, t]]
+        scale = np.where(active, step.sum(axis=1), 1.0)
+        alpha = np.where(active[:, None], step / safe_scale(scale)[:, None], alpha)
+        scales[:, t] = scale
+        alphas[:, t] = np.where(active[:, None], alpha, 0.0)
+
+    return alphas, scales
+
+
+def compute_backward_scaled(transitions, emissions, end_probs, obs_idx, lengths, scales, end_scale):
+    # Scaled with the forward constants, so alphas * betas are the state posteriors
+    B, T = obs_idx.shape
+    emissions_T = emissions.T
+    betas = np.zeros((B, T, transitions.shape[0]))
+
+    beta_end = end_probs[None, :] / safe_scale(end_scale)[:, None]
+    beta = beta_end
+    for t in range(T - 1, -1, -1):
+        if t < T - 1:
+            step = propagate_back(emissions_T[obs_idx[:, t + 1]] * beta / safe_scale(scales[:, t + 1])[:, None], transitions)
+            beta = np.where((t < lengths - 1)[:, None], step, beta)
+        beta = np.where((t == lengths - 1)[:, None], beta_end, beta)
+        betas[:, t] = np.where((t < lengths)[:, None], beta, 0.0)
+    return betas
+
+
+def compute_posteriors(start_probs, transitions, emissions, observations, end_probs, lengths=None):
+    obs_idx, lengths = as_batch(observations, lengths, emissions.shape[1])
+    alphas, scales = compute_forward_scaled(start_probs, transitions, emissions, obs_idx, lengths)
+    end_scale = alphas[np.arange(len(lengths)), lengths - 1] @ end_probs
+    betas = compute_backward_scaled(transitions, emissions, end_probs, obs_idx, lengths, scales, end_scale)
+    log_likelihood = log_scale(scales).sum(axis=1) + log_scale(end_scale)
+    return alphas * betas, log_likelihood
+
+
+def expected_counts(start_probs, transitions, emissions, end_probs, obs_idx, lengths):
+    B, T = obs_idx.shape
+    alphas, scales = compute_forward_scaled(start_probs, transitions, emissions, obs_idx, lengths)
+    end_scale = alphas[np.arange(B), lengths - 1] @ end_probs
+    betas = compute_backward_scaled(transitions, emissions, end_probs, obs_idx, lengths, scales, end_scale)
+    gammas = alphas * betas
+
+    # xi summed over sequences and time: alpha_t(i) * a_ij * b_j(o_t+1) * beta_t+1(j) / c_t+1
+    weighted_next = emissions.T[obs_idx[:, 1:]] * betas[:, 1:] / safe_scale(scales[:, 1:])[:, :, None]
+    trans_counts = transitions * np.einsum('bti,btj->ij', alphas[:, :-1], weighted_next)
+
+    emit_counts = np.zeros((emissions.shape[1], emissions.shape[0]))
+    np.add.at(emit_counts, obs_idx.ravel(), gammas.reshape(B * T, -1))
+
+    start_counts = gammas[:, 0].sum(axis=0)
+    end_counts = gammas[np.arange(B), lengths - 1].sum(axis=0)
+    log_likelihood = (log_scale(scales).sum(axis=1) + log_scale(end_scale)).sum()
+    return start_counts, trans_counts, emit_counts.T, end_counts, log_likelihood
+
+
+def _expected_counts_chunk(args):
+    return expected_counts(*args)
+
+
+def baum_welch(sequences, start_probs, transitions, emissions, end_probs,
+               max_iter=100, tol=1e-6, chunk_size=1024, n_jobs=1, verbose=False):
+    # Sort by length so each padded chunk wastes little work on padding
+    order = sorted(range(len(sequences)), key=lambda i: len(sequences[i]))
+    chunks = []
+    for i in range(0, len(order), chunk_size):
+        chunk = [sequences[j] for j in order[i:i + chunk_size] if len(sequences[j]) > 0]
+        if chunk:
+            chunks.append(as_batch(chunk, None, emissions.shape[1]))
+
+    # The M-step re-estimates every transition, so training always works on a dense matrix
+    if isinstance(transitions, BandedTransitions) or _is_sparse(transitions):
+        transitions = transitions.toarray()
+    start_probs, transitions, emissions, end_probs = (
+        np.array(start_probs, dtype=float), np.array(transitions, dtype=float),
+        np.array(emissions, dtype=float), np.array(end_probs, dtype=float))
+
+    history = []
+    previous = -np.inf
+    executor = ProcessPoolExecutor(n_jobs) if n_jobs > 1 else None
+    try:
+        for iteration in range(max_iter):
+            started = time.perf_counter()
+
+            # E-step: accumulate expected counts over all chunks
+            jobs = [(start_probs, transitions, emissions, end_probs, obs_idx, lengths)
+                    for obs_idx, lengths in chunks]
+            results = executor.map(_expected_counts_chunk, jobs) if executor else map(_expected_counts_chunk, jobs)
+            start_counts, trans_counts, emit_counts, end_counts, log_likelihood = (
+                sum(parts) for parts in zip(*results))
+
+            # M-step: every row of [transitions | end_probs] and emissions is renormalised
+            out_totals = np.maximum(trans_counts.sum(axis=1) + end_counts, 1e-300)
+            transitions = trans_counts / out_totals[:, None]
+            end_probs = end_counts / out_totals
+            emissions = emit_counts / np.maximum(emit_counts.sum(axis=1, keepdims=True), 1e-300)
+            start_probs = start_counts / start_counts.sum()
+
+            # Equal values also cover an impossible sequence keeping both at -inf
+            converged = log_likelihood == previous or log_likelihood - previous < tol
+            history.append({
+                'iteration': iteration,
+                'log_likelihood': float(log_likelihood),
+                'seconds': time.perf_counter() - started,
+                'converged': bool(converged),
+            })
+            if verbose:
+                print(f"  Iteration {iteration}: log-likelihood = {log_likelihood:.6f} "
+                      f"({history[-1]['seconds']:.3f}s)")
+            if converged:
+                break
+            previous = log_likelihood
+    finally:
+        if executor:
+            executor.shutdown()
+
+    return start_probs, transitions, emissions, end_probs, history
 
 
 def compute_viterbi_log(start_probs, transitions, emissions, observations, end_probs, state_names):
-    n_states = transitions.shape[0]
-    T = len(observations)
+    paths, _ = compute_viterbi_batch(start_probs, transitions, emissions, [observations], end_probs)
+    return [state_names[i] for i in paths[0]]
 
-    log = np.log
-    viterbi = np.full((n_states, T), -np.inf)
-    backpointer = np.zeros((n_states, T), dtype=int)
+
+def compute_viterbi_batch(start_probs, transitions, emissions, observations, end_probs, lengths=None):
+    obs_idx, lengths = as_batch(observations, lengths, emissions.shape[1])
+    B, T = obs_idx.shape
+    n_states = transitions.shape[0]
 
     # Convert to log-space
+    log = np.log
     log_start = log(start_probs + 1e-12)
-    log_trans = log(transitions + 1e-12)
-    log_emit = log(emissions + 1e-12)
+    log_trans = log_transitions(transitions)
+    log_emit_T = log(emissions + 1e-12).T
     log_end = log(end_probs + 1e-12)
 
+    # Backpointers use the smallest unsigned dtype that can index every state
+    backpointer = np.empty((T, B, n_states), dtype=np.min_scalar_type(max(n_states - 1, 0)))
+    keep = np.arange(n_states, dtype=backpointer.dtype)
+
     # Initialization
-    for s in range(n_states):
-        viterbi[s][0] = log_start[s] + log_emit[s][observations[0] - 1]
+    viterbi = log_start[None, :] + log_emit_T[obs_idx[:, 0]]
 
-    # Recursion
+    # Recursion: max/argmax over predecessors as one broadcast per step.
+    # Finished sequences keep their scores and point to themselves, so the backtrace
+    # passes through the padding unchanged.
     for t in range(1, T):
-        for s in range(n_states):
-            log_probs = [viterbi[sp][t - 1] + log_trans[sp][s] for sp in range(n_states)]
-            best_prev = np.argmax(log_probs)
-            viterbi[s][t] = log_probs[best_prev] + log_emit[s][observations[t] - 1]
-            backpointer[s][t] = best_prev
+        active = (t < lengths)[:, None]
+        best, best_prev = max_predecessors(viterbi, log_trans)
+        viterbi = np.where(active, best + log_emit_T[obs_idx[:, t]], viterbi)
+        backpointer[t] = np.where(active, best_prev, keep)
 
     # Termination: Add transition to END state
-    final_probs = [viterbi[s][T - 1] + log_end[s] for s in range(n_states)]
-    last_state = np.argmax(final_probs)
+    final_scores = viterbi + log_end[None, :]
+    last_state = final_scores.argmax(axis=1)
+    best_log_probs = final_scores[np.arange(B), last_state]
 
-    # Backtrace
-    path_indices = [last_state]
+    # Backtrace (linear in T)
+    path_indices = np.empty((B, T), dtype=np.int64)
+    rows = np.arange(B)
+    path_indices[:, T - 1] = last_state
     for t in range(T - 1, 0, -1):
-        last_state = backpointer[last_state][t]
-        path_indices.insert(0, last_state)
+        path_indices[:, t - 1] = backpointer[t, rows, path_indices[:, t]]
+
+    paths = [path_indices[b, :lengths[b]] for b in range(B)]
+    return paths, best_log_probs
+
+
+def filter_stream(start_probs, transitions, emissions, observations):
+    # Yields P(state_t | o_1..o_t) as each observation arrives; O(N^2) time and O(N) memory per step
+    alpha = None
+    for obs in observations:
+        emit = emissions[:, obs - 1]
+        alpha = start_probs * emit if alpha is None else propagate(alpha[None, :], transitions)[0] * emit
+        alpha = alpha / safe_scale(alpha.sum())
+        yield alpha
+
+
+def fixed_lag_smoother(start_probs, transitions, emissions, observations, lag):
+    # Yields (t, P(state_t | o_1..o_t+lag)) once lag more observations have arrived.
+    # Only the last lag+1 filtered distributions and emission columns are kept.
+    window = deque()
+    t = 0
+    alpha = None
+    for obs in observations:
+        emit = emissions[:, obs - 1]
+        alpha = start_probs * emit if alpha is None else propagate(alpha[None, :], transitions)[0] * emit
+        alpha = alpha / safe_scale(alpha.sum())
+        window.append((alpha, emit))
+        if len(window) > lag:
+            yield t, _smooth_oldest(transitions, window)
+            window.popleft()
+            t += 1
+
+    # End of stream: smooth whatever is left with the evidence that exists
+    while window:
+        yield t, _smooth_oldest(transitions, window)
+        window.popleft()
+        t += 1
+
+
+def _smooth_oldest(transitions, window):
+    beta = np.ones(transitions.shape[0])
+    for k in range(len(window) - 1, 0, -1):
+        beta = propagate_back((window[k][1] * beta)[None, :], transitions)[0]
+        beta /= safe_scale(beta.sum())
+    smoothed = window[0][0] * beta
+    return smoothed / safe_scale(smoothed.sum())
+
+
+def online_viterbi(start_probs, transitions, emissions, observations, end_probs=None, max_window=None):
+    # Yields (t, state index) for each time step as soon as every survivor path agrees on it.
+    # With max_window set, the best survivor is force-committed when the undecided stretch
+    # grows past it, so memory stays bounded even if the survivors never converge.
+    n_states = transitions.shape[0]
+    log_trans = log_transitions(transitions)
+    log_emit = np.log(emissions + 1e-12)
+    all_states = np.arange(n_states)
+
+    backpointers = deque()  # backpointers[k] maps states at time first + k + 1 to time first + k
+    first = 0  # earliest time not yet committed
+    viterbi = None
+    for obs in observations:
+        if viterbi is None:
+            viterbi = np.log(start_probs + 1e-12) + log_emit[:, obs - 1]
+        else:
+            best, best_prev = max_predecessors(viterbi[None, :], log_trans)
+            viterbi = best[0] + log_emit[:, obs - 1]
+            best_prev = best_prev[0]
+            backpointers.append(best_prev)
+        viterbi -= viterbi.max()  # only differences matter, keep the numbers small
+
+        # Trace all survivors back to the most recent time where they coalesce
+        survivors = all_states
+        for k in range(len(backpointers) - 1, -1, -1):
+            survivors = np.unique(backpointers[k][survivors])
+            if survivors.size == 1:
+                yield from _commit(backpointers, first, k, survivors[0])
+                first += k + 1
+                break
+
+        if max_window is not None and len(backpointers) >= max_window:
+            state = viterbi.argmax()
+            for k in range(len(backpointers) - 1, -1, -1):
+                state = backpointers[k][state]
+            yield first, int(state)
+            backpointers.popleft()
+            first += 1
+
+    if viterbi is None:
+        return
+
+    # End of stream: commit the rest along the best final state
+    final = viterbi if end_probs is None else viterbi + np.log(end_probs + 1e-12)
+    yield from _commit(backpointers, first, len(backpointers), final.argmax())
+
 
-    return [state_names[i] for i in path_indices]
+def _commit(backpointers, first, k, state):
+    # Emits times first..first + k ending in state, and drops the backpointers that led there
+    path = [int(state)]
+    for j in range(k - 1, -1, -1):
+        path.append(int(backpointers[j][path[-1]]))
+    for _ in range(k + 1):
+        if backpointers:
+            backpointers.popleft()
+    for offset, s in enumerate(reversed(path)):
+        yield first + offset, s
 
 
 if __name__ == '__main__':